@@ -0,0 +1,103 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from game_state import GameState
+from policies import POLICIES
+from settings import GAME_STATE_GAME_OVER, spawn_rate, boss_spawn_chance, powerup_min_value, powerup_max_value
+
+RESULT_FIELDS = [
+    'seed', 'policy', 'spawn_rate', 'boss_spawn_chance', 'powerup_min_value', 'powerup_max_value',
+    'score', 'peak_player_instances', 'frames_survived', 'boss_kills', 'game_over',
+]
+
+def run_game(job):
+    # Play one seeded game to the end (or to max_frames) and return its result row
+    seed, policy_name, game_spawn_rate, game_boss_chance, min_value, max_value, max_frames = job
+    input_rng = random.Random(seed ^ 0x5EED)
+    policy = POLICIES[policy_name]
+
+    state = GameState(seed)
+    state.spawn_rate = game_spawn_rate
+    state.boss_spawn_chance = game_boss_chance
+    state.powerup_min_value = min_value
+    state.powerup_max_value = max_value
+
+    while state.game_state != GAME_STATE_GAME_OVER and state.frames_survived < max_frames:
+        state.step(policy(input_rng, state))
+
+    return (seed, policy_name, game_spawn_rate, game_boss_chance, min_value, max_value,
+            state.score, state.peak_player_instances, state.frames_survived, state.boss_kills,
+            int(state.game_state == GAME_STATE_GAME_OVER))
+
+def parse_value_range(text):
+    # "-5:5" -> (-5, 5)
+    low, high = (int(part) for part in text.split(':'))
+    if high <= low:
+        raise argparse.ArgumentTypeError("powerup range needs two distinct values (min:max)")
+    return low, high
+
+def print_summary(rows):
+    # Aggregate the results per parameter set: mean, median and p90 score plus mean stats
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[1:6], []).append(row)
+
+    print(f"{'policy':>8} {'spawn':>5} {'boss%':>6} {'values':>7} {'games':>6} "
+          f"{'score':>8} {'median':>8} {'p90':>8} {'frames':>8} {'peak':>6} {'bosses':>6}")
+    for (policy_name, game_spawn_rate, game_boss_chance, min_value, max_value), group in sorted(groups.items()):
+        scores = sorted(row[6] for row in group)
+        p90 = scores[min(len(scores) - 1, int(len(scores) * 0.9))]
+        print(f"{policy_name:>8} {game_spawn_rate:>5} {game_boss_chance * 100:>5.1f}% {min_value:>3}:{max_value:<3} "
+              f"{len(group):>6} {statistics.mean(scores):>8.1f} {statistics.median(scores):>8} {p90:>8} "
+              f"{statistics.mean(row[8] for row in group):>8.0f} "
+              f"{statistics.mean(row[7] for row in group):>6.1f} "
+              f"{statistics.mean(row[9] for row in group):>6.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many seeded games in parallel and collect their results")
+    parser.add_argument("--games", type=int, default=100, help="games per parameter combination")
+    parser.add_argument("--seed", type=int, default=0, help="first seed, games use consecutive seeds")
+    parser.add_argument("--policy", nargs='+', choices=sorted(POLICIES), default=["random"])
+    parser.add_argument("--spawn-rate", nargs='+', type=int, default=[spawn_rate])
+    parser.add_argument("--boss-chance", nargs='+', type=float, default=[boss_spawn_chance])
+    # Repeated rather than nargs='+' since ranges like -5:5 would otherwise be taken for options
+    parser.add_argument("--powerup-range", action='append', type=parse_value_range,
+                        help="min:max powerup values, pass as --powerup-range=-5:5 and repeat to sweep")
+    parser.add_argument("--max-frames", type=int, default=60 * 60 * 10, help="stop games that last longer than this")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output", default="batch_results.csv", help="CSV file to write the per-game results to")
+    args = parser.parse_args()
+    powerup_ranges = args.powerup_range or [(powerup_min_value, powerup_max_value)]
+
+    jobs = [
+        (args.seed + game, policy_name, game_spawn_rate, game_boss_chance, min_value, max_value, args.max_frames)
+        for policy_name, game_spawn_rate, game_boss_chance, (min_value, max_value) in itertools.product(
+            args.policy, args.spawn_rate, args.boss_chance, powerup_ranges)
+        for game in range(args.games)
+    ]
+
+    start = time.perf_counter()
+    # Small chunks keep all workers busy even though game lengths vary a lot
+    chunksize = max(1, len(jobs) // (args.workers * 8))
+    with multiprocessing.Pool(args.workers) as pool:
+        rows = list(pool.imap_unordered(run_game, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    rows.sort()
+
+    with open(args.output, 'w', newline='') as result_file:
+        writer = csv.writer(result_file)
+        writer.writerow(RESULT_FIELDS)
+        writer.writerows(rows)
+
+    total_frames = sum(row[8] for row in rows)
+    print(f"{len(rows)} games, {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / elapsed:.0f} frames/s on {args.workers} workers), results in {args.output}")
+    print_summary(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+# Run from anywhere: the game modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+from game_state import GameState
+from profiler import FrameProfiler
+from settings import GAME_STATE_GAME_OVER
+from scenarios import SCENARIOS
+
+def play(scenario, frames, seed, renderer=None, profiler=None):
+    # Play the scenario for a fixed number of frames, starting it over whenever the player dies
+    state = GameState(seed)
+    state.profiler = profiler
+    scenario.setup(state)
+    for frame in range(frames):
+        if profiler is not None:
+            profiler.begin_frame()
+        state.step(scenario.inputs(state, frame))
+        if state.game_state == GAME_STATE_GAME_OVER:
+            state.reset(state.seed + 1)
+            scenario.setup(state)
+        elif renderer is not None:
+            renderer.draw_game(state)
+            if profiler is not None:
+                profiler.mark('draw')
+        if profiler is not None:
+            profiler.end_frame()
+
+def run_scenario(scenario, frames, seed, renderer, repeats):
+    # Timed runs with the profiler, keeping the best time of each phase and of the whole run over
+    # the repeats to leave out noise from the rest of the machine. Then a separate run under
+    # tracemalloc for the peak memory
+    elapsed = None
+    phases_ms = {}
+    for _ in range(repeats):
+        profiler = FrameProfiler()
+        start = time.perf_counter()
+        play(scenario, frames, seed, renderer, profiler)
+        run_time = time.perf_counter() - start
+        elapsed = run_time if elapsed is None else min(elapsed, run_time)
+        for phase, ms in profiler.total_ms.items():
+            phases_ms[phase] = min(phases_ms.get(phase, ms), ms)
+
+    tracemalloc.start()
+    play(scenario, frames, seed, renderer)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'description': scenario.description,
+        'frames': frames,
+        'fps': round(frames / elapsed, 1),
+        'ms_per_frame': round(elapsed * 1000 / frames, 4),
+        'phases_ms': {phase: round(ms / frames, 4) for phase, ms in phases_ms.items()},
+        'peak_memory_kb': round(peak_memory / 1024),
+    }
+
+def find_mismatches(baseline, rendered, seed, scenario_frames):
+    # Reasons the baseline was measured differently from this run, empty if the two can be compared
+    mismatches = []
+    if baseline.get('rendered') != rendered:
+        mismatches.append(f"baseline was {'' if baseline.get('rendered') else 'not '}rendered, "
+                          f"this run is {'' if rendered else 'not '}rendered")
+    if baseline.get('seed') != seed:
+        mismatches.append(f"baseline used seed {baseline.get('seed')}, this run seed {seed}")
+    for name, frames in scenario_frames.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is not None and previous['frames'] != frames:
+            mismatches.append(f"{name} ran {previous['frames']} frames in the baseline, {frames} in this run")
+    return mismatches
+
+def compare(results, baseline, threshold, min_change_ms):
+    # Regressions are slower frames, slower phases or more memory than the baseline by more than
+    # threshold. Times also have to grow by at least min_change_ms, below that it is only noise
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        checks = [('ms_per_frame', result['ms_per_frame'], previous['ms_per_frame'], min_change_ms),
+                  ('peak_memory_kb', result['peak_memory_kb'], previous['peak_memory_kb'], 0)]
+        checks.extend((f"phase {phase}", ms, previous['phases_ms'][phase], min_change_ms)
+                      for phase, ms in result['phases_ms'].items() if phase in previous['phases_ms'])
+        for metric, value, old_value, min_change in checks:
+            change = (value - old_value) / old_value if old_value > 0 else 0.0
+            marker = "REGRESSION" if change > threshold and value - old_value >= min_change else ""
+            print(f"{name:>10} {metric:<22} {old_value:>10} -> {value:<10} {change:+7.1%} {marker}")
+            if marker:
+                regressions.append((name, metric))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the seeded benchmark scenarios")
+    parser.add_argument("--scenario", nargs='+', choices=[scenario.name for scenario in SCENARIOS],
+                        help="only run these scenarios")
+    parser.add_argument("--frames", type=int, help="override the number of frames of every scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true", help="only benchmark the simulation, skip drawing")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--compare", help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging, 0.10 = 10%%")
+    parser.add_argument("--min-change-ms", type=float, default=0.02,
+                        help="times must also grow by at least this many ms per frame to be flagged")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per scenario, the best one counts")
+    args = parser.parse_args()
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario]
+
+    # Only results measured the same way can be compared, check before spending time on the runs
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        mismatches = find_mismatches(baseline, not args.no_render, args.seed,
+                                     {scenario.name: args.frames or scenario.frames for scenario in scenarios})
+        if mismatches:
+            for mismatch in mismatches:
+                print(f"Can't compare with {args.compare}: {mismatch}")
+            sys.exit(2)
+
+    renderer = None
+    if not args.no_render:
+        import main as renderer
+        renderer.init_display()
+
+    results = {}
+    for scenario in scenarios:
+        result = run_scenario(scenario, args.frames or scenario.frames, args.seed, renderer, args.repeats)
+        results[scenario.name] = result
+        phases = ", ".join(f"{phase} {ms:.3f}" for phase, ms in result['phases_ms'].items())
+        print(f"{scenario.name:>10}: {result['fps']:>8.1f} FPS, {result['ms_per_frame']:.3f} ms/frame, "
+              f"peak {result['peak_memory_kb']} KiB ({phases})")
+
+    with open(args.output, 'w') as result_file:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'rendered': renderer is not None,
+            'seed': args.seed,
+            'repeats': args.repeats,
+            'scenarios': results,
+        }, result_file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.min_change_ms)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print("No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from game_state import INPUT_LEFT, INPUT_RIGHT, INPUT_FIRE
+
+# Fixed, seeded workloads. Each scenario sets up a freshly reset GameState (again after a
+# game over, so the load stays the same for the whole run) and returns the inputs per frame.
+
+def sweeping_fire(frame, fire_every):
+    # Sweep across the road, changing direction every 2 seconds, and fire every fire_every frames
+    inputs = INPUT_LEFT if (frame // 120) % 2 == 0 else INPUT_RIGHT
+    if frame % fire_every == 0:
+        inputs |= INPUT_FIRE
+    return inputs
+
+class Scenario:
+    name = None
+    frames = 600
+    description = ""
+
+    def setup(self, state):
+        pass
+
+    def inputs(self, state, frame):
+        return sweeping_fire(frame, 10)
+
+class SparseField(Scenario):
+    name = "sparse"
+    description = "1 player against the normal enemy stream"
+
+class SustainedFire(Scenario):
+    name = "fire500"
+    frames = 300
+    description = "500 player instances holding fire every frame"
+
+    def setup(self, state):
+        state.player_instances = 500
+
+    def inputs(self, state, frame):
+        return sweeping_fire(frame, 1)
+
+class BossWave(Scenario):
+    name = "bosses20"
+    description = "20 bosses on the road at once against 50 player instances"
+
+    def setup(self, state):
+        state.player_instances = 50
+        for i in range(20):
+            state.boss_enemies.append(state.rng.random(), 100 + i * 10, health=state.rng.randint(10, 100))
+
+    def inputs(self, state, frame):
+        # Keep the wave topped up as bosses are destroyed or leave the screen
+        while state.boss_enemies.count < 20:
+            state.boss_enemies.append(state.rng.random(), 100, health=state.rng.randint(10, 100))
+        return sweeping_fire(frame, 5)
+
+class PowerupStream(Scenario):
+    name = "powerups"
+    description = "a new powerup pair every 10 frames"
+
+    def setup(self, state):
+        state.powerup_spawn_rate = 10
+
+SCENARIOS = [SparseField(), SustainedFire(), BossWave(), PowerupStream()]
@@ -0,0 +1,41 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Every measurement starts a fresh interpreter, so module imports and pygame start cold
+GAME_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASUREMENTS = {
+    # Interpreter start plus importing the game module, as tools like headless.py --render do
+    'import main': "import main",
+    # Everything up to the first frame being shown, as `python main.py` does
+    'first frame': "import main, pygame\n"
+                   "from game_state import GameState\n"
+                   "main.init_display()\n"
+                   "main.draw_game(GameState(0))\n"
+                   "pygame.display.flip()",
+    # Interpreter start alone, to subtract from the numbers above
+    'python': "pass",
+}
+
+def time_launch(code):
+    environment = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=GAME_DIRECTORY, env=environment, check=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Time cold launches of the game module in fresh interpreters")
+    parser.add_argument("--runs", type=int, default=10, help="launches per measurement, the median is reported")
+    args = parser.parse_args()
+
+    for name, code in MEASUREMENTS.items():
+        times = [time_launch(code) for _ in range(args.runs)]
+        print(f"{name:>12}: median {statistics.median(times) * 1000:7.1f} ms, "
+              f"min {min(times) * 1000:7.1f} ms over {args.runs} runs")
+
+if __name__ == "__main__":
+    main()
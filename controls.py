@@ -0,0 +1,43 @@
+import pygame
+from game_state import INPUT_LEFT, INPUT_RIGHT
+
+# Window events after which the window contents may be gone (uncovered, restored or shown again)
+EXPOSE_EVENTS = [pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSHOWN]
+
+# Event types the game reacts to, everything else is dropped by SDL before it reaches the queue
+HANDLED_EVENTS = [pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP] + EXPOSE_EVENTS
+
+class FrameInput:
+    # Everything the player did since the last frame, read once per frame by read_input()
+    def __init__(self):
+        self.quit = False
+        self.pressed = []  # Keys pressed down, in order
+        self.movement = 0  # INPUT_LEFT / INPUT_RIGHT bits of the arrow keys held down
+        self.fire_pressed = False  # Fire was pressed at least once
+        self.fire_held = False  # Fire is held down right now
+        self.exposed = False  # The window has to be redrawn in full
+
+def setup_input():
+    # Call once the display is open
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(HANDLED_EVENTS)
+
+def read_input():
+    # Drain the event queue in one go and combine it with the keys held down
+    frame_input = FrameInput()
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            frame_input.quit = True
+        elif event.type == pygame.KEYDOWN:
+            frame_input.pressed.append(event.key)
+        elif event.type in EXPOSE_EVENTS:
+            frame_input.exposed = True
+
+    keys = pygame.key.get_pressed()
+    if keys[pygame.K_LEFT]:
+        frame_input.movement |= INPUT_LEFT
+    if keys[pygame.K_RIGHT]:
+        frame_input.movement |= INPUT_RIGHT
+    frame_input.fire_pressed = pygame.K_SPACE in frame_input.pressed
+    frame_input.fire_held = keys[pygame.K_SPACE]
+    return frame_input
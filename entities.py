@@ -0,0 +1,171 @@
+import struct
+import numpy as np
+from settings import (
+    PROJECTILE_BASE_WIDTH, PROJECTILE_BASE_HEIGHT, projectile_speed,
+    ENEMY_BASE_WIDTH, ENEMY_BASE_HEIGHT, enemy_speed, POWERUP_BASE_WIDTH, POWERUP_BASE_HEIGHT, powerup_speed,
+)
+
+# count, next_spawn_id and dropped at the start of EntityStore.pack() output
+PACKED_COUNTERS = struct.Struct('<qqq')
+
+class EntityStore:
+    # Structure-of-arrays storage for one kind of entity (enemies, bosses, powerups, projectiles).
+    # Only the first `count` rows are in use. Removing entities during a frame just clears their
+    # alive flag so indices stay stable; compact() then fills the holes by swapping in rows from the end.
+    # Row order is therefore arbitrary, spawn_id keeps track of the order entities were created in.
+    # With max_capacity set the store never grows past it, it works as a fixed pool and entities
+    # that do not fit are dropped (and counted) instead.
+
+    COLUMNS = ('normalized_x', 'y', 'health', 'value', 'flash_timer', 'spawn_id', 'alive')
+
+    def __init__(self, capacity=256, max_capacity=None):
+        self.count = 0
+        self.max_capacity = max_capacity
+        self.dropped = 0
+        self.normalized_x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.health = np.zeros(capacity, dtype=np.int64)
+        self.value = np.zeros(capacity, dtype=np.int64)
+        self.flash_timer = np.zeros(capacity, dtype=np.int64)
+        self.spawn_id = np.zeros(capacity, dtype=np.int64)
+        self.next_spawn_id = 0
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.y)
+
+    def _reserve(self, needed):
+        capacity = len(self.y)
+        if self.max_capacity is not None:
+            needed = min(needed, self.max_capacity)  # A full pool stays as it is, the overflow gets dropped
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        if self.max_capacity is not None:
+            capacity = min(capacity, self.max_capacity)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def append(self, normalized_x, y, health=0, value=0, flash_timer=0):
+        self._reserve(self.count + 1)
+        i = self.count
+        if i == len(self.y):
+            self.dropped += 1
+            return
+        self.normalized_x[i] = normalized_x
+        self.y[i] = y
+        self.health[i] = health
+        self.value[i] = value
+        self.flash_timer[i] = flash_timer
+        self.spawn_id[i] = self.next_spawn_id
+        self.alive[i] = True
+        self.count += 1
+        self.next_spawn_id += 1
+
+    def extend(self, normalized_x, y, value=0):
+        # Append a whole batch of entities given as arrays of positions, value can be an array too
+        added = len(y)
+        start = self.count
+        self._reserve(start + added)
+        if start + added > len(self.y):
+            # Full pool, keep as much of the start of the batch as fits
+            kept = len(self.y) - start
+            self.dropped += added - kept
+            normalized_x = normalized_x[:kept]
+            y = y[:kept]
+            if np.ndim(value):
+                value = value[:kept]
+            added = kept
+        end = start + added
+        self.normalized_x[start:end] = normalized_x
+        self.y[start:end] = y
+        self.health[start:end] = 0
+        self.value[start:end] = value
+        self.flash_timer[start:end] = 0
+        self.spawn_id[start:end] = np.arange(self.next_spawn_id, self.next_spawn_id + added)
+        self.alive[start:end] = True
+        self.count = end
+        self.next_spawn_id += added
+
+    def kill(self, indices):
+        # indices can be row numbers or a boolean mask over the rows in use
+        self.alive[:self.count][indices] = False
+
+    def live_rows(self):
+        # Rows of the live entities, oldest first
+        rows = np.flatnonzero(self.alive[:self.count])
+        return rows[np.argsort(self.spawn_id[rows], kind='stable')]
+
+    def compact(self):
+        # Swap-remove every dead row: live rows past the new end move into the holes before it
+        count = self.count
+        dead = np.flatnonzero(~self.alive[:count])
+        if len(dead) == 0:
+            return
+        new_count = count - len(dead)
+        holes = dead[dead < new_count]
+        movers = np.flatnonzero(self.alive[new_count:count]) + new_count
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[holes] = column[movers]
+        self.count = new_count
+
+    def pack(self):
+        # Counters and the rows in use, as bytes for snapshots
+        parts = [PACKED_COUNTERS.pack(self.count, self.next_spawn_id, self.dropped)]
+        parts.extend(getattr(self, name)[:self.count].tobytes() for name in self.COLUMNS)
+        return b''.join(parts)
+
+    def unpack(self, buffer, offset=0):
+        # Replace the contents with pack() output found in buffer at offset, returns the offset after it
+        count, next_spawn_id, dropped = PACKED_COUNTERS.unpack_from(buffer, offset)
+        offset += PACKED_COUNTERS.size
+        self.clear()
+        self._reserve(count)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[:count] = np.frombuffer(buffer, dtype=column.dtype, count=count, offset=offset)
+            offset += count * column.itemsize
+        self.count = count
+        self.next_spawn_id = next_spawn_id
+        self.dropped = dropped
+        return offset
+
+    def clear(self):
+        self.alive[:self.count] = False
+        self.count = 0
+        self.dropped = 0
+
+class EntityKind:
+    # What sets one kind of entity apart. GameState moves and collides every kind with the same
+    # code, driven by these parameters; the entities themselves live in an EntityStore per kind.
+
+    __slots__ = ('name', 'base_width', 'base_height', 'size_multiplier', 'speed', 'speed_factor',
+                 'homing', 'home_after_move', 'score', 'boss')
+
+    def __init__(self, name, base_width, base_height, speed, size_multiplier=1, speed_factor=1.0,
+                 homing=0.0, home_after_move=False, score=0, boss=False):
+        self.name = name
+        self.base_width = base_width
+        self.base_height = base_height
+        self.size_multiplier = size_multiplier
+        self.speed = speed  # Pixels per base frame, sped up by perspective for entities coming down the road
+        self.speed_factor = speed_factor
+        self.homing = homing  # How quickly the player is tracked horizontally, 0 for not at all
+        self.home_after_move = home_after_move  # Track the player from the new rather than the old y position
+        self.score = score  # Points for destroying one
+        self.boss = boss  # Counts towards boss_kills
+
+PROJECTILE = EntityKind('projectile', PROJECTILE_BASE_WIDTH, PROJECTILE_BASE_HEIGHT, projectile_speed)
+ENEMY = EntityKind('enemy', ENEMY_BASE_WIDTH, ENEMY_BASE_HEIGHT, enemy_speed,
+                   homing=0.01, home_after_move=True, score=10)
+BOSS = EntityKind('boss', ENEMY_BASE_WIDTH, ENEMY_BASE_HEIGHT, enemy_speed,
+                  size_multiplier=4, speed_factor=0.7, homing=0.005, score=50, boss=True)  # Larger, slower, tougher
+POWERUP = EntityKind('powerup', POWERUP_BASE_WIDTH, POWERUP_BASE_HEIGHT, powerup_speed)
@@ -0,0 +1,91 @@
+import math
+from array import array
+from collections import OrderedDict
+import numpy as np
+
+# Rings are squashed vertically so the formation looks like it lies flat on the road
+RING_Y_SCALE = 0.3
+
+# How many distinct layouts (instance count / instance size combinations) to keep around
+MAX_CACHED_LAYOUTS = 32
+
+_layout_cache = OrderedDict()
+
+def _build_layout(instances, instance_width, circle_radius):
+    # Offsets of every player instance from the formation center, stored as flat double arrays,
+    # plus the rings: index of their first instance and the range of offsets they cover
+    if instances <= 0:
+        return array('d'), array('d'), (array('q'), array('d'), array('d'), array('d'), array('d'))
+
+    # A single instance sits right on the base position
+    if instances == 1:
+        return (array('d', [0.0]), array('d', [0.0]),
+                (array('q', [0]), array('d', [0.0]), array('d', [0.0]), array('d', [0.0]), array('d', [0.0])))
+
+    # Multiple instances are distributed in concentric rings. Every ring holds as many as fit around
+    # it (in closed form, for all rings at once) until the instances run out, the last ring takes
+    # whatever is left
+    max_ring = math.ceil(math.sqrt(instances))
+    ring_radii = circle_radius * np.arange(1, max_ring + 1) / max_ring
+    capacities = np.floor(2 * math.pi * ring_radii / (instance_width * 1.5)).astype(np.int64)
+    placed_before = np.minimum(np.cumsum(capacities) - capacities, instances)
+    counts = np.minimum(capacities, instances - placed_before)
+    counts[-1] = instances - placed_before[-1]
+
+    # Skip rings where no instances would be placed
+    used = counts > 0
+    ring_radii = ring_radii[used]
+    counts = counts[used]
+    ring_starts = np.cumsum(counts) - counts
+
+    # Instances are spread evenly around their ring, starting at angle 0
+    ring_of = np.repeat(np.arange(len(counts)), counts)
+    angles = (2 * math.pi / counts)[ring_of] * (np.arange(instances) - ring_starts[ring_of])
+    radii = ring_radii[ring_of]
+    offsets_x = radii * np.cos(angles)
+    offsets_y = radii * np.sin(angles) * RING_Y_SCALE
+
+    ring_bounds = (np.minimum.reduceat(offsets_x, ring_starts), np.maximum.reduceat(offsets_x, ring_starts),
+                   np.minimum.reduceat(offsets_y, ring_starts), np.maximum.reduceat(offsets_y, ring_starts))
+    rings = (array('q', ring_starts.astype(np.int64).tobytes()),) + tuple(array('d', bounds.tobytes())
+                                                                         for bounds in ring_bounds)
+    return array('d', offsets_x.tobytes()), array('d', offsets_y.tobytes()), rings
+
+def get_formation_layout(instances, instance_width, circle_radius):
+    # Returns (offsets_x, offsets_y, rings) for the given formation, building it only on a cache miss.
+    # rings is (first instance, min offset x, max offset x, min offset y, max offset y) per ring
+    key = (instances, instance_width, circle_radius)
+    layout = _layout_cache.get(key)
+    if layout is not None:
+        _layout_cache.move_to_end(key)
+        return layout
+
+    layout = _build_layout(instances, instance_width, circle_radius)
+    _layout_cache[key] = layout
+    if len(_layout_cache) > MAX_CACHED_LAYOUTS:
+        _layout_cache.popitem(last=False)  # Evict the least recently used layout
+    return layout
+
+def get_visible_instances(instances, cap):
+    # Returns (instances in the formation, players each of them stands for, how many of the first
+    # instances stand for one player more), adding up to exactly the given number of players.
+    # Without a cap (None), or below it, every player is an instance of its own
+    if cap is None or instances <= cap:
+        return max(instances, 0), 1, 0
+    weight, heavier = divmod(instances, cap)
+    return cap, weight, heavier
+
+def get_instance_weights(instances, cap):
+    # Players each instance of the formation stands for, as an int64 array in instance order
+    visible, weight, heavier = get_visible_instances(instances, cap)
+    weights = np.full(visible, weight, dtype=np.int64)
+    weights[:heavier] += 1
+    return weights
+
+def get_formation_offsets(instances, instance_width, circle_radius):
+    # Returns (offsets_x, offsets_y) for the given formation
+    offsets_x, offsets_y, _ = get_formation_layout(instances, instance_width, circle_radius)
+    return offsets_x, offsets_y
+
+def clear_formation_cache():
+    _layout_cache.clear()
@@ -0,0 +1,311 @@
+import argparse
+import multiprocessing
+import os
+import time
+import numpy as np
+from game_state import GameState
+from perspective import get_depth
+from settings import WINDOW_WIDTH, ROAD_WIDTH_BOTTOM, GAME_STATE_GAME_OVER
+
+# Reinforcement learning environments around GameState, with the reset()/step() interface of
+# Gym(nasium) but without depending on it.
+#
+# Actions are the INPUT_* bit combinations, 0 to 7 (LEFT 1, RIGHT 2, FIRE 4).
+# Observations are fixed-size float32 vectors:
+#   player       normalized x on the road, formation size
+#   enemies      NEAREST_ENEMIES lowest on the road: present, normalized x, depth (0 horizon, 1 bottom)
+#   bosses       NEAREST_BOSSES lowest:                present, normalized x, depth, health
+#   powerups     NEAREST_POWERUPS lowest:              present, normalized x, depth, value
+# Entities are ranked by how far down the road they are, the player's end, not by their distance
+# to the player across it. Empty slots are all zeros. The reward is the score gained by the step.
+
+NEAREST_ENEMIES = 8
+NEAREST_BOSSES = 2
+NEAREST_POWERUPS = 4
+ACTIONS = 8
+
+PLAYER_FEATURES = 2
+ENEMY_FEATURES = 3
+OBSERVATION_SIZE = (PLAYER_FEATURES + NEAREST_ENEMIES * ENEMY_FEATURES
+                    + (NEAREST_BOSSES + NEAREST_POWERUPS) * (ENEMY_FEATURES + 1))
+
+# Observation sections after the player features: store attribute, slots, extra column (or None)
+SECTIONS = (
+    ('enemies', NEAREST_ENEMIES, None),
+    ('boss_enemies', NEAREST_BOSSES, 'health'),
+    ('powerups', NEAREST_POWERUPS, 'value'),
+)
+
+# Arrays a vector env shares with its worker processes: name, dtype and shape per game
+SHARED_ARRAYS = (
+    ('actions', np.int64, ()),
+    ('observations', np.float32, (OBSERVATION_SIZE,)),
+    ('rewards', np.float32, ()),
+    ('terminated', np.bool_, ()),
+    ('truncated', np.bool_, ()),
+    ('final_scores', np.int64, ()),
+)
+
+def write_entities(out, stores, k, extra=None):
+    # Fill the k slots per game of out (shaped (games, k, features)) from the entities nearest
+    # the bottom in each game's store, nearest first, for all games in one pass
+    counts = np.array([store.count for store in stores])
+    y = np.concatenate([store.y[:store.count] for store in stores])
+    games = np.repeat(np.arange(len(stores)), counts)
+    # Sorted by game, then lowest on the road first; lexsort is stable so entities level with each other keep their row order
+    order = np.lexsort((-y, games))
+    slots = np.arange(len(order)) - (np.cumsum(counts) - counts)[games]
+    kept = slots < k
+    rows, games, slots = order[kept], games[kept], slots[kept]
+
+    out[:] = 0
+    out[games, slots, 0] = 1
+    out[games, slots, 1] = np.concatenate([store.normalized_x[:store.count] for store in stores])[rows]
+    out[games, slots, 2] = get_depth(y[rows])
+    if extra is not None:
+        out[games, slots, 3] = np.concatenate([getattr(store, extra)[:store.count] for store in stores])[rows]
+
+def write_observations(out, states):
+    # Write the observation of every state into its row of the float32 array out
+    games = len(states)
+    player_x = np.array([state.player_x for state in states])
+    out[:, 0] = (player_x - (WINDOW_WIDTH//2 - ROAD_WIDTH_BOTTOM//2)) / ROAD_WIDTH_BOTTOM
+    out[:, 1] = [state.player_instances for state in states]
+    end = PLAYER_FEATURES
+    for name, k, extra in SECTIONS:
+        features = ENEMY_FEATURES if extra is None else ENEMY_FEATURES + 1
+        offset, end = end, end + k * features
+        write_entities(out[:, offset:end].reshape(games, k, features),
+                       [getattr(state, name) for state in states], k, extra)
+    return out
+
+def write_observation(out, state):
+    # Write the observation of state into the float32 vector out
+    write_observations(out.reshape(1, OBSERVATION_SIZE), [state])
+    return out
+
+class GameEnv:
+    # One game. Each step() applies the action for frame_skip simulation steps;
+    # truncated is set once max_steps actions were taken without the game ending
+
+    def __init__(self, seed=0, frame_skip=1, max_steps=None):
+        self.state = GameState(seed)
+        self.next_seed = seed
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.steps = 0
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+
+    def reset(self, seed=None):
+        # Returns (observation, info). Games are seeded seed, seed + 1, ... from the last seed given
+        if seed is not None:
+            self.next_seed = seed
+        self.state.reset(self.next_seed)
+        self.next_seed += 1
+        self.steps = 0
+        return write_observation(self.observation, self.state).copy(), self.info()
+
+    def step(self, action):
+        # Returns (observation, reward, terminated, truncated, info)
+        state = self.state
+        score = state.score
+        for _ in range(self.frame_skip):
+            state.step(int(action))
+            if state.game_state == GAME_STATE_GAME_OVER:
+                break
+        self.steps += 1
+        terminated = state.game_state == GAME_STATE_GAME_OVER
+        truncated = not terminated and self.max_steps is not None and self.steps >= self.max_steps
+        observation = write_observation(self.observation, state).copy()
+        return observation, state.score - score, terminated, truncated, self.info()
+
+    def info(self):
+        state = self.state
+        return {'score': state.score, 'player_instances': state.player_instances,
+                'frames_survived': state.frames_survived, 'seed': state.seed}
+
+class VectorGameEnv:
+    # num_envs independent games stepped by one call with an array of actions. Observations,
+    # rewards and flags come back as arrays with one row per game, the observations of all games
+    # are built together. A game that ends is started over right away with its next seed: its row
+    # then holds the first observation of the new game, and final_score in the info arrays holds
+    # the score it ended with (-1 elsewhere). Game i plays seeds seed + i, seed + i + seed_stride,
+    # ... (seed_stride is num_envs unless given). The games are stepped one after the other,
+    # ProcessVectorGameEnv spreads them over worker processes.
+
+    def __init__(self, num_envs, seed=0, frame_skip=1, max_steps=None, seed_stride=None, arrays=None):
+        # arrays optionally holds the output arrays to write into, named as in SHARED_ARRAYS
+        self.num_envs = num_envs
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.seed_stride = num_envs if seed_stride is None else seed_stride
+        self.seeds = seed + np.arange(num_envs)
+        self.states = [GameState(seed + i) for i in range(num_envs)]
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        if arrays is None:
+            arrays = {name: np.zeros((num_envs,) + shape, dtype=dtype) for name, dtype, shape in SHARED_ARRAYS}
+        self.observations = arrays['observations']
+        self.rewards = arrays['rewards']
+        self.terminated = arrays['terminated']
+        self.truncated = arrays['truncated']
+        self.final_scores = arrays['final_scores']
+
+    def restart(self, i):
+        self.states[i].reset(int(self.seeds[i]))
+        self.seeds[i] += self.seed_stride
+        self.steps[i] = 0
+
+    def start_games(self, seed=None):
+        # Start a fresh game in every slot and write the first observations
+        if seed is not None:
+            self.seeds = seed + np.arange(self.num_envs)
+        for i in range(self.num_envs):
+            self.restart(i)
+        self.final_scores[:] = -1
+        write_observations(self.observations, self.states)
+
+    def advance(self, actions):
+        # Step every game with its action and write the results into the output arrays
+        frame_skip = self.frame_skip
+        self.steps += 1
+        self.final_scores[:] = -1
+        for i, (state, action) in enumerate(zip(self.states, np.asarray(actions).tolist())):
+            score = state.score
+            for _ in range(frame_skip):
+                state.step(action)
+                if state.game_state == GAME_STATE_GAME_OVER:
+                    break
+            self.rewards[i] = state.score - score
+            terminated = state.game_state == GAME_STATE_GAME_OVER
+            truncated = not terminated and self.max_steps is not None and self.steps[i] >= self.max_steps
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            if terminated or truncated:
+                self.final_scores[i] = state.score
+                self.restart(i)
+        write_observations(self.observations, self.states)
+
+    def reset(self, seed=None):
+        # Returns (observations, info) for a fresh game in every slot, seeded seed, seed + 1, ...
+        self.start_games(seed)
+        return self.observations.copy(), {'final_score': self.final_scores.copy()}
+
+    def step(self, actions):
+        # Returns (observations, rewards, terminated, truncated, info), all arrays of num_envs rows
+        self.advance(actions)
+        return (self.observations.copy(), self.rewards.copy(), self.terminated.copy(), self.truncated.copy(),
+                {'final_score': self.final_scores.copy()})
+
+    def close(self):
+        pass
+
+def view_shared_arrays(buffers, num_envs):
+    # NumPy arrays over the shared memory blocks of a ProcessVectorGameEnv
+    return {name: np.frombuffer(buffers[name], dtype=dtype).reshape((num_envs,) + shape)
+            for name, dtype, shape in SHARED_ARRAYS}
+
+def run_worker(connection, buffers, num_envs, start, end, seed, frame_skip, max_steps):
+    # Worker process of a ProcessVectorGameEnv, runs games start to end and writes their results
+    # straight into the shared arrays. Messages are ('reset', seed), ('step',) and None to stop
+    arrays = {name: array[start:end] for name, array in view_shared_arrays(buffers, num_envs).items()}
+    env = VectorGameEnv(end - start, seed + start, frame_skip, max_steps, seed_stride=num_envs, arrays=arrays)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if message[0] == 'step':
+            env.advance(arrays['actions'])
+        else:
+            env.start_games(None if message[1] is None else message[1] + start)
+        connection.send(True)
+    connection.close()
+
+class ProcessVectorGameEnv:
+    # VectorGameEnv with its games split over worker processes, which step their share at the same
+    # time. Actions and results are passed in shared memory, so a step only sends a short message
+    # to every worker. Plays the same games with the same seeds as a VectorGameEnv of the same size.
+    # Call close() when done.
+
+    def __init__(self, num_envs, seed=0, frame_skip=1, max_steps=None, workers=None):
+        self.num_envs = num_envs
+        workers = max(1, min(workers or os.cpu_count(), num_envs))
+        self.buffers = {name: multiprocessing.RawArray('b', num_envs * int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                        for name, dtype, shape in SHARED_ARRAYS}
+        self.arrays = view_shared_arrays(self.buffers, num_envs)
+        self.connections = []
+        self.processes = []
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int).tolist()
+        for start, end in zip(bounds, bounds[1:]):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_worker, name=f"game_env-{start}",
+                args=(worker_connection, self.buffers, num_envs, start, end, seed, frame_skip, max_steps),
+                daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def send(self, message):
+        # Send message to every worker and wait until all of them are done with it
+        for connection in self.connections:
+            connection.send(message)
+        for connection in self.connections:
+            connection.recv()
+
+    def results(self):
+        arrays = self.arrays
+        return (arrays['observations'].copy(), arrays['rewards'].copy(), arrays['terminated'].copy(),
+                arrays['truncated'].copy(), {'final_score': arrays['final_scores'].copy()})
+
+    def reset(self, seed=None):
+        # Returns (observations, info) for a fresh game in every slot, seeded seed, seed + 1, ...
+        self.send(('reset', seed))
+        observations, _, _, _, info = self.results()
+        return observations, info
+
+    def step(self, actions):
+        # Returns (observations, rewards, terminated, truncated, info), all arrays of num_envs rows
+        self.arrays['actions'][:] = actions
+        self.send(('step',))
+        return self.results()
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure environment steps per second with random actions")
+    parser.add_argument("--envs", type=int, default=64, help="number of games stepped together")
+    parser.add_argument("--steps", type=int, default=1000, help="vector steps to take")
+    parser.add_argument("--frame-skip", type=int, default=1, help="simulation steps per action")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes to spread the games over, 0 to step them all in this process")
+    args = parser.parse_args()
+
+    if args.workers:
+        env = ProcessVectorGameEnv(args.envs, args.seed, args.frame_skip, workers=args.workers)
+    else:
+        env = VectorGameEnv(args.envs, args.seed, args.frame_skip)
+    env.reset()
+    action_rng = np.random.default_rng(args.seed)
+    games = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, terminated, truncated, _ = env.step(action_rng.integers(0, ACTIONS, args.envs))
+        games += int(terminated.sum() + truncated.sum())
+    elapsed = time.perf_counter() - start
+    env.close()
+
+    env_steps = args.steps * args.envs
+    print(f"{env_steps} environment steps ({env_steps * args.frame_skip} frames) in {elapsed:.2f}s: "
+          f"{env_steps / elapsed:.0f} steps/s, {games} game(s) finished")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+import hashlib
+import random
+import numpy as np
+from formation import get_formation_offsets, get_formation_layout, get_visible_instances, get_instance_weights, RING_Y_SCALE
+from spatial_grid import ProjectileGrid, expand_ranges
+from entities import EntityStore, PROJECTILE, ENEMY, BOSS, POWERUP
+from perspective import get_depth, get_scale_factor, get_scale_factors, get_road_width, get_x_position_on_road
+from settings import (
+    WINDOW_WIDTH, WINDOW_HEIGHT, ROAD_WIDTH_BOTTOM, HORIZON_Y,
+    PLAYER_WIDTH, PLAYER_HEIGHT, PLAYER_START_X, PLAYER_Y, player_speed, player_circle_radius,
+    PROJECTILE_POOL_SIZE,
+    COLLISION_BUFFER, GRID_CELL_SIZE, USE_PROJECTILE_GRID, SWEPT_COLLISIONS, FORMATION_INSTANCE_CAP, COLLISION_BLOCK_SIZE, DIRECT_FORMATION_SIZE, FORMATION_TEST_CHUNK,
+    spawn_rate, boss_spawn_chance, powerup_spawn_rate, powerup_min_value, powerup_max_value, flash_speed,
+    SIMULATION_HZ, BASE_SIMULATION_HZ, GAME_STATE_PLAYING, GAME_STATE_GAME_OVER,
+)
+
+# Input bits passed to GameState.step
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_FIRE = 4
+
+def get_entity_rects(x, y, base_width, base_height, size_multiplier=1):
+    # Batched (left, top, width, height) of perspective-scaled entities centered on (x, y)
+    scale = get_scale_factors(y)
+    width = base_width * scale
+    height = base_height * scale
+    if size_multiplier != 1:
+        width = width * size_multiplier
+        height = height * size_multiplier
+    return x - width // 2, y - height // 2, width, height
+
+def check_collision(x1, y1, w1, h1, x2, y2, w2, h2):
+    # Add a small buffer to make collisions more forgiving
+    buffer = COLLISION_BUFFER
+    return (x1 < x2 + w2 + buffer and x1 + w1 + buffer > x2 and
+            y1 < y2 + h2 + buffer and y1 + h1 + buffer > y2)
+
+def check_collisions(x1, y1, w1, h1, x2, y2, w2, h2):
+    # Batched check_collision, the arguments are arrays that broadcast against each other
+    buffer = COLLISION_BUFFER
+    return ((x1 < x2 + w2 + buffer) & (x1 + w1 + buffer > x2) &
+            (y1 < y2 + h2 + buffer) & (y1 + h1 + buffer > y2))
+
+def check_group_collisions(min_x1, max_x1, min_y1, max_y1, w1, h1, x2, y2, w2, h2):
+    # check_collisions against a group of w1 x h1 rects whose left and top edges lie within the given
+    # ranges. True wherever at least one rect of the group could pass check_collision, so a False
+    # here safely rules out the whole group
+    buffer = COLLISION_BUFFER
+    return ((min_x1 < x2 + w2 + buffer) & (max_x1 + w1 + buffer > x2) &
+            (min_y1 < y2 + h2 + buffer) & (max_y1 + h1 + buffer > y2))
+
+def home_towards(normalized_x, y, target_x, movement_scale):
+    # Batched horizontal tracking of target_x, returns the new normalized x positions
+    road_width = get_road_width(y)
+    current_x = get_x_position_on_road(normalized_x, y, road_width)
+
+    # Calculate direction to player
+    dx = target_x - current_x
+
+    # Update normalized_x based on direction
+    normalized_movement = (dx / road_width) * movement_scale
+
+    # Keep normalized_x within bounds
+    return np.clip(normalized_x + normalized_movement, 0, 1)
+
+class GameState:
+    # Everything needed to simulate a game, without any dependency on the display.
+    # Call step() once per frame with the INPUT_* bits that are active for that frame.
+    # All randomness comes from the state's own seeded rng, so the same seed and the same
+    # inputs always play out the same game.
+    # One step covers 1 / tick_rate seconds, speeds are scaled and frame counts converted to match.
+
+    def __init__(self, seed=None, tick_rate=SIMULATION_HZ, swept_collisions=SWEPT_COLLISIONS,
+                 formation_cap=FORMATION_INSTANCE_CAP):
+        self.tick_rate = tick_rate
+        self.swept_collisions = swept_collisions  # Test projectiles over their whole path, see settings.py
+        self.formation_cap = formation_cap  # Most instances the formation is split into, see settings.py
+        self.tick_scale = BASE_SIMULATION_HZ / tick_rate  # Fraction of a base frame that one step covers
+        self.flash_period = self.ticks(flash_speed)  # Steps between two flashes of the powerup numbers
+
+        self.spawn_rate = spawn_rate
+        self.boss_spawn_chance = boss_spawn_chance
+        self.powerup_spawn_rate = powerup_spawn_rate
+        self.powerup_min_value = powerup_min_value
+        self.powerup_max_value = powerup_max_value
+
+        # Projectiles use normalized_x and y, screen x is derived from them. They live in a preallocated
+        # pool so heavy fire never reallocates
+        self.projectiles = EntityStore(capacity=PROJECTILE_POOL_SIZE, max_capacity=PROJECTILE_POOL_SIZE)
+        self.enemies = EntityStore()  # Regular enemies: normalized_x, y
+        self.boss_enemies = EntityStore(capacity=16)  # Boss enemies: normalized_x, y, health
+        self.powerups = EntityStore(capacity=16)  # Powerups: normalized_x, y, value, flash_timer
+        self.projectile_grid = ProjectileGrid(GRID_CELL_SIZE, COLLISION_BUFFER)
+        self.active_projectiles = np.zeros(0, dtype=np.int64)  # Projectiles not culled this frame
+        self.profiler = None  # Set to a FrameProfiler to time the phases of step()
+        self.rng = random.Random()
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Start a new game, from the given seed or a fresh random one
+        if seed is None:
+            seed = random.randrange(1 << 63)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.player_x = PLAYER_START_X
+        self.player_y = PLAYER_Y
+        self.player_instances = 1
+        self.score = 0
+        self.frame_count = 0
+        # Stats for the current game
+        self.frames_survived = 0
+        self.peak_player_instances = 1
+        self.boss_kills = 0
+        self.enemies.clear()
+        self.boss_enemies.clear()
+        self.projectiles.clear()
+        self.powerups.clear()
+        self.game_state = GAME_STATE_PLAYING
+
+    def ticks(self, frames):
+        # Number of steps lasting as long as the given number of base frames
+        return max(1, round(frames / self.tick_scale))
+
+    def state_hash(self):
+        # Digest of everything that decides how the rest of the game plays out, to compare replays
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((float(self.player_x), float(self.player_y), self.player_instances, self.score,
+                            self.frame_count, self.game_state, self.rng.getstate())).encode())
+        for store in (self.projectiles, self.enemies, self.boss_enemies, self.powerups):
+            for name in store.COLUMNS:
+                digest.update(getattr(store, name)[:store.count].tobytes())
+        return digest.digest()
+
+    def spawn_enemy(self):
+        # Chance to spawn a boss enemy instead of regular enemies
+        if self.rng.random() < self.boss_spawn_chance:
+            normalized_x = self.rng.random()
+            health = self.rng.randint(10, 100)
+            self.boss_enemies.append(normalized_x, HORIZON_Y, health=health)
+            return
+
+        # Regular enemy cluster spawning
+        cluster_size = self.rng.randint(3, 12)  # Increased from 2-10 to 3-12 enemies per cluster
+        cluster_spread = 0.2  # How spread out the cluster is horizontally
+
+        # Choose a center point for the cluster
+        center_x = self.rng.random()
+        # Ensure the center point allows for spread in both directions
+        center_x = max(cluster_spread, min(1 - cluster_spread, center_x))
+
+        # Create enemies in the cluster
+        for _ in range(cluster_size):
+            # Add some random spread to x position
+            spread = self.rng.uniform(-cluster_spread, cluster_spread)
+            normalized_x = max(0, min(1, center_x + spread))
+
+            # Add some variation to starting y position for more natural grouping
+            y_variation = self.rng.uniform(-20, 20)
+            self.enemies.append(normalized_x, HORIZON_Y + y_variation)
+
+    def spawn_powerup_pair(self):
+        # Spawn two powerups side by side, each taking up 1/4 of the road width
+        base_x = self.rng.random() * 0.5  # Base position for the left powerup, allowing only left half of road
+
+        # Position powerups so they each take up 1/4 of the road
+        # Left powerup centered at 1/4 position from base_x
+        left_x = base_x + 0.125  # 0.125 is 1/8 of road width, centering it in its quarter
+        # Right powerup centered at 1/4 position from left powerup
+        right_x = left_x + 0.25  # Move 1/4 of road width to center of next quarter
+
+        # Create random values for the powerups
+        val1 = self.rng.randint(self.powerup_min_value, self.powerup_max_value)
+        val2 = self.rng.randint(self.powerup_min_value, self.powerup_max_value)
+        while val2 == val1:  # Ensure different values
+            val2 = self.rng.randint(self.powerup_min_value, self.powerup_max_value)
+
+        # Make powerups larger to match their designated space
+        self.powerups.append(left_x, HORIZON_Y, value=val1)  # flash_timer starts at 0
+        self.powerups.append(right_x, HORIZON_Y, value=val2)
+
+    def fire_volley(self):
+        # Fire a projectile from each player instance, laid out with the scaled width the formation
+        # is drawn and collided with so shots leave from where the players are shown. Each projectile
+        # keeps the number of players its instance stands for as its value, the damage it deals
+        player_width = PLAYER_WIDTH * get_scale_factor(self.player_y)
+        weights = get_instance_weights(self.player_instances, self.formation_cap)
+        offsets_x, offsets_y = get_formation_offsets(len(weights), player_width, player_circle_radius)
+        x = self.player_x + np.frombuffer(offsets_x)
+        y = self.player_y + np.frombuffer(offsets_y)
+
+        # Calculate normalized x position for each projectile
+        normalized_x = (x - (WINDOW_WIDTH//2 - ROAD_WIDTH_BOTTOM//2)) / ROAD_WIDTH_BOTTOM
+        self.spawn_projectiles(normalized_x, y, weights)
+
+    def spawn_projectiles(self, normalized_x, y, damage=1):
+        # Add projectiles at the given positions, single values or arrays. damage goes in the value
+        # column, for all of them or one per projectile, so a shot never deals nothing by accident
+        self.projectiles.extend(np.atleast_1d(normalized_x), np.atleast_1d(y), damage)
+
+    def get_store_rects(self, store, kind):
+        # Rects of every row in use of the store, at the entities' current positions
+        n = store.count
+        y = store.y[:n]
+        x = get_x_position_on_road(store.normalized_x[:n], y)
+        return self.get_rects(kind, x, y)
+
+    def get_projectile_sweeps(self, projectile_rects):
+        # Rects covering the whole path every projectile moved along this step. Going straight up
+        # the road, in screen space a projectile also drifts sideways with the narrowing road and
+        # shrinks a little, both linear in y. So the path is bounded from the end rects directly
+        # (a pixel more at every side covers the rounding of rect sizes) instead of building the
+        # rects at the start as well. Fired this step, the path starts at the formation
+        n = self.projectiles.count
+        travel = PROJECTILE.speed * self.tick_scale
+        drift = (get_road_width(travel) - get_road_width(0)) * (self.projectiles.normalized_x[:n] - 0.5)
+        shrink = get_depth(travel) - get_depth(0)  # Most the perspective scale can change by
+        margin = PROJECTILE.base_width * shrink / 2 + 1
+        left, top, width, height = projectile_rects
+        return (left + np.minimum(drift, 0) - margin, top - 1, width + np.abs(drift) + 2 * margin,
+                height + (travel + PROJECTILE.base_height * shrink / 2 + 2))
+
+    def get_target_sweeps(self, store, kind, rects):
+        # Rects of enemies or bosses stretched up by the distance they move in a step. That is at
+        # least how far they came down since the last step, as they speed up towards the bottom
+        n = store.count
+        travel = kind.speed * (1 + get_depth(store.y[:n])) * kind.speed_factor * self.tick_scale
+        left, top, width, height = rects
+        return left, top - travel, width, height + travel
+
+    def cull_projectiles(self, projectile_rects, target_rects):
+        # Rows of the projectiles that could still hit something this frame: the others are entirely
+        # above every enemy and boss (new ones only arrive in later frames)
+        proj_left, proj_top, proj_width, proj_height = projectile_rects
+        lowest_reach = (proj_top + proj_height) + COLLISION_BUFFER  # As in check_collisions
+        target_top = min((rects[1].min() for rects in target_rects if len(rects[1])), default=None)
+        if target_top is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(lowest_reach > target_top)
+
+    def get_formation_reach(self):
+        # Rects whose top is at or below this can't touch the formation. The lowest instance is never
+        # further below the formation center than the outer ring (plus a pixel for rounding), however
+        # many instances are lost during the frame
+        player_height = PLAYER_HEIGHT * get_scale_factor(self.player_y)
+        lowest_top = (self.player_y + player_circle_radius * RING_Y_SCALE + 1) - player_height//2
+        return (lowest_top + player_height) + COLLISION_BUFFER
+
+    def cull_below(self, candidates, top, reach):
+        # Drop the candidates whose top is at or below reach, they have already passed what they could hit
+        kept = candidates[top[candidates] < reach]
+        if self.profiler is not None:
+            self.profiler.count('culled', len(candidates) - len(kept))
+        return kept
+
+    def find_projectile_hits(self, rects, candidates, projectile_rects):
+        # Pair every candidate (in order) with the oldest live projectile that hits it.
+        # Each projectile is used up by the first candidate it hits.
+        projectiles = self.projectiles
+        active = self.active_projectiles
+        left, top, width, height = (column[candidates] for column in rects)
+        if USE_PROJECTILE_GRID:
+            pair_rects, pair_projectiles = self.projectile_grid.query_pairs(left, top, width, height)
+            pair_projectiles = active[pair_projectiles]
+        else:
+            pair_rects = np.repeat(np.arange(len(candidates)), len(active))
+            pair_projectiles = np.tile(active, len(candidates))
+        if self.profiler is not None:
+            self.profiler.count('projectile_tests', len(pair_rects))
+
+        proj_left, proj_top, proj_width, proj_height = projectile_rects
+        overlapping = check_collisions(
+            proj_left[pair_projectiles], proj_top[pair_projectiles],
+            proj_width[pair_projectiles], proj_height[pair_projectiles],
+            left[pair_rects], top[pair_rects], width[pair_rects], height[pair_rects])
+
+        pair_rects = pair_rects[overlapping]
+        pair_projectiles = pair_projectiles[overlapping]
+        order = np.lexsort((projectiles.spawn_id[pair_projectiles], pair_rects))
+
+        hits = []
+        last_rect = -1
+        for rect_index, proj_index in zip(pair_rects[order].tolist(), pair_projectiles[order].tolist()):
+            if rect_index == last_rect or not projectiles.alive[proj_index]:
+                continue
+            projectiles.alive[proj_index] = False
+            hits.append((int(candidates[rect_index]), proj_index))
+            last_rect = rect_index
+        return hits
+
+    def find_formation_hit(self, rects, candidates):
+        # Position in candidates of the first rect touching any player instance, or -1.
+        # Rects are first tested against the bounds of the whole formation, then against the bounds
+        # of each ring, and only the instances of the rings they touch are tested one by one
+        player_scale = get_scale_factor(self.player_y)
+        player_width = PLAYER_WIDTH * player_scale
+        player_height = PLAYER_HEIGHT * player_scale
+        offsets_x, offsets_y, rings = get_formation_layout(get_visible_instances(self.player_instances, self.formation_cap)[0],
+                                                           player_width, player_circle_radius)
+        if len(offsets_x) == 0 or len(candidates) == 0:
+            return -1
+        left, top, width, height = rects
+
+        # Small formations are cheaper to test directly
+        if len(offsets_x) <= DIRECT_FORMATION_SIZE:
+            instance_left = (self.player_x + np.frombuffer(offsets_x)) - player_width//2
+            instance_top = (self.player_y + np.frombuffer(offsets_y)) - player_height//2
+            chunk = candidates[:, None]
+            touching = check_collisions(
+                instance_left, instance_top, player_width, player_height,
+                left[chunk], top[chunk], width[chunk], height[chunk]).any(axis=1)
+            if self.profiler is not None:
+                self.profiler.count('formation_tests', len(candidates) * len(offsets_x))
+            return int(np.argmax(touching)) if touching.any() else -1
+
+        # Ring bounds go through the same arithmetic as the instance positions, which keeps them exact
+        ring_starts, ring_min_x, ring_max_x, ring_min_y, ring_max_y = (np.frombuffer(column, dtype=column.typecode)
+                                                                       for column in rings)
+        ring_min_left = (self.player_x + ring_min_x) - player_width//2
+        ring_max_left = (self.player_x + ring_max_x) - player_width//2
+        ring_min_top = (self.player_y + ring_min_y) - player_height//2
+        ring_max_top = (self.player_y + ring_max_y) - player_height//2
+
+        # Whole formation
+        near = np.flatnonzero(check_group_collisions(
+            ring_min_left.min(), ring_max_left.max(), ring_min_top.min(), ring_max_top.max(),
+            player_width, player_height,
+            left[candidates], top[candidates], width[candidates], height[candidates]))
+        if self.profiler is not None:
+            self.profiler.count('formation_tests', len(candidates))
+        if len(near) == 0:
+            return -1
+
+        instance_left = (self.player_x + np.frombuffer(offsets_x)) - player_width//2
+        instance_top = (self.player_y + np.frombuffer(offsets_y)) - player_height//2
+        ring_sizes = np.diff(ring_starts, append=len(instance_left))
+
+        block = max(1, COLLISION_BLOCK_SIZE // len(ring_starts))
+        for start in range(0, len(near), block):
+            positions = near[start:start + block]
+            rows = candidates[positions]
+
+            # Rings, as a (rect, ring) matrix
+            pair_rects, pair_rings = np.nonzero(check_group_collisions(
+                ring_min_left, ring_max_left, ring_min_top, ring_max_top, player_width, player_height,
+                left[rows, None], top[rows, None], width[rows, None], height[rows, None]))
+            if self.profiler is not None:
+                self.profiler.count('formation_tests', len(rows) * len(ring_starts))
+
+            # Single instances of the touched rings, still in rect order and a few rings at a time
+            pair_sizes = ring_sizes[pair_rings]
+            pair_ends = np.cumsum(pair_sizes)
+            chunk_start = 0
+            while chunk_start < len(pair_rings):
+                tested = int(pair_ends[chunk_start - 1]) if chunk_start > 0 else 0
+                chunk_end = max(chunk_start + 1,
+                                int(np.searchsorted(pair_ends, tested + FORMATION_TEST_CHUNK, side='right')))
+                chunk_rects = pair_rects[chunk_start:chunk_end]
+                chunk_sizes = pair_sizes[chunk_start:chunk_end]
+                instances = expand_ranges(ring_starts[pair_rings[chunk_start:chunk_end]], chunk_sizes)
+                pair_owners = np.repeat(chunk_rects, chunk_sizes)
+                pair_rows = rows[pair_owners]
+                touching = check_collisions(
+                    instance_left[instances], instance_top[instances], player_width, player_height,
+                    left[pair_rows], top[pair_rows], width[pair_rows], height[pair_rows])
+                if self.profiler is not None:
+                    self.profiler.count('formation_tests', len(instances))
+                if touching.any():
+                    return int(positions[pair_owners[np.argmax(touching)]])
+                chunk_start = chunk_end
+        return -1
+
+    def step(self, inputs=0):
+        # Advance the simulation by one step (one frame at the base rate)
+        if self.game_state != GAME_STATE_PLAYING:
+            return
+        profiler = self.profiler
+
+        # Increment frame counter at the start of the frame
+        self.frame_count = (self.frame_count + 1) % self.ticks(3600)  # Reset counter every minute to prevent overflow
+        self.frames_survived += 1
+
+        # Advance the flashing of the powerup numbers, before this frame's spawns which start at 0
+        n = self.powerups.count
+        self.powerups.flash_timer[:n] = (self.powerups.flash_timer[:n] + 1) % (self.flash_period * 2)
+
+        # Spawn enemies and powerups
+        if self.frame_count % self.ticks(self.spawn_rate) == 0:
+            self.spawn_enemy()
+        if self.frame_count % self.ticks(self.powerup_spawn_rate) == 0:
+            self.spawn_powerup_pair()
+        if profiler is not None:
+            profiler.mark('spawn')
+
+        if inputs & INPUT_FIRE:
+            self.fire_volley()
+
+        # Player movement
+        normalized_player_x = (self.player_x - (WINDOW_WIDTH//2 - ROAD_WIDTH_BOTTOM//2)) / ROAD_WIDTH_BOTTOM
+        if inputs & INPUT_LEFT and normalized_player_x > 0:
+            self.player_x -= player_speed * self.tick_scale
+        if inputs & INPUT_RIGHT and normalized_player_x < 1:
+            self.player_x += player_speed * self.tick_scale
+        if profiler is not None:
+            profiler.mark('player')
+
+        self.update_projectiles()
+        # Collisions use the positions from the start of the frame. Projectiles above every
+        # target are culled, the broad phase is built once from the rest for all enemy and boss checks
+        projectile_rects = self.get_store_rects(self.projectiles, PROJECTILE)
+        enemy_rects = self.get_store_rects(self.enemies, ENEMY)
+        boss_rects = self.get_store_rects(self.boss_enemies, BOSS)
+        # With swept collisions projectiles are tested over their whole path this step, against
+        # targets stretched over theirs, so nothing tunnels through however fast it moves
+        enemy_targets, boss_targets = enemy_rects, boss_rects
+        if self.swept_collisions:
+            projectile_rects = self.get_projectile_sweeps(projectile_rects)
+            enemy_targets = self.get_target_sweeps(self.enemies, ENEMY, enemy_rects)
+            boss_targets = self.get_target_sweeps(self.boss_enemies, BOSS, boss_rects)
+        self.active_projectiles = self.cull_projectiles(projectile_rects, (enemy_targets, boss_targets))
+        if USE_PROJECTILE_GRID:
+            self.projectile_grid.rebuild(*(column[self.active_projectiles] for column in projectile_rects))
+        if profiler is not None:
+            profiler.count('culled', self.projectiles.count - len(self.active_projectiles))
+            profiler.mark('projectiles')
+
+        self.update_hostiles(self.enemies, ENEMY, enemy_rects, enemy_targets, projectile_rects)
+        if profiler is not None:
+            profiler.mark('enemies')
+        self.update_hostiles(self.boss_enemies, BOSS, boss_rects, boss_targets, projectile_rects)
+        if self.swept_collisions:
+            self.retire_projectiles()
+        self.projectiles.compact()
+        if profiler is not None:
+            profiler.mark('bosses')
+        self.update_powerups()
+        if profiler is not None:
+            profiler.mark('powerups')
+            profiler.count('projectiles', self.projectiles.count)
+            profiler.count('enemies', self.enemies.count)
+            profiler.count('bosses', self.boss_enemies.count)
+            profiler.count('powerups', self.powerups.count)
+            profiler.count('players', self.player_instances)
+            profiler.count('projectile_drops', self.projectiles.dropped)
+
+        # Check if player died
+        if self.player_instances <= 0:
+            self.game_state = GAME_STATE_GAME_OVER
+
+    def update_projectiles(self):
+        projectiles = self.projectiles
+        n = projectiles.count
+        projectiles.y[:n] -= PROJECTILE.speed * self.tick_scale
+        # Swept, the last stretch of projectiles crossing the horizon is still tested, they are only
+        # retired after the collision pass
+        if not self.swept_collisions:
+            self.retire_projectiles()
+        projectiles.compact()
+
+    def retire_projectiles(self):
+        # Mark the projectiles past the horizon for removal at the next compact()
+        projectiles = self.projectiles
+        projectiles.kill(projectiles.y[:projectiles.count] < HORIZON_Y)
+
+    def get_rects(self, kind, x, y):
+        return get_entity_rects(x, y, kind.base_width, kind.base_height, kind.size_multiplier)
+
+    def move_down_road(self, store, kind, normalized_x, y):
+        # Move the first store.count entities of a kind from (normalized_x, y) down the road
+        n = store.count
+        # Update y position with perspective-based speed
+        speed_scale = 1 + get_depth(y)  # Moves faster when closer
+        store.y[:n] = y + kind.speed * speed_scale * kind.speed_factor * self.tick_scale
+
+        # Update x position to move towards player
+        if kind.homing:
+            movement_scale = kind.homing * self.tick_scale
+            store.normalized_x[:n] = home_towards(normalized_x, store.y[:n] if kind.home_after_move else y,
+                                                  self.player_x, movement_scale)
+
+    def update_hostiles(self, store, kind, rects, target_rects, projectile_rects):
+        # Move enemies or bosses, then let projectiles and the player formation hit them.
+        # Collisions use the rects and health they had at the start of the frame, target_rects are
+        # the rects projectiles are tested against
+        n = store.count
+        normalized_x = store.normalized_x[:n].copy()
+        y = store.y[:n].copy()
+        health = store.health[:n].copy()
+        self.move_down_road(store, kind, normalized_x, y)
+        store.kill(y > WINDOW_HEIGHT)
+
+        # Every projectile hit takes one health per player its instance stood for when it was fired,
+        # regular enemies spawn with none and go down to the first
+        damage = self.projectiles.value
+        active = self.active_projectiles
+        projectile_reach = -np.inf
+        if len(active):
+            projectile_reach = ((projectile_rects[1][active] + projectile_rects[3][active]) + COLLISION_BUFFER).max()
+        candidates = self.cull_below(store.live_rows(), target_rects[1], projectile_reach)
+        for index, proj_index in self.find_projectile_hits(target_rects, candidates, projectile_rects):
+            store.health[index] -= damage[proj_index]
+            if store.health[index] <= 0:
+                store.alive[index] = False
+                self.score += kind.score
+                if kind.boss:
+                    self.boss_kills += 1
+
+        # Then check collision with player instances, every hit shrinks the formation for the rest
+        # by the health left (at least one)
+        candidates = self.cull_below(store.live_rows(), rects[1], self.get_formation_reach())
+        hit = self.find_formation_hit(rects, candidates)
+        while hit >= 0:
+            index = candidates[hit]
+            store.alive[index] = False
+            self.player_instances -= max(1, int(health[index]))
+            if self.player_instances <= 0:
+                self.game_state = GAME_STATE_GAME_OVER
+            candidates = candidates[hit + 1:]
+            hit = self.find_formation_hit(rects, candidates)
+        store.compact()
+
+    def update_powerups(self):
+        powerups = self.powerups
+        n = powerups.count
+        self.move_down_road(powerups, POWERUP, powerups.normalized_x[:n], powerups.y[:n])
+        y = powerups.y[:n]
+        powerups.kill(y > WINDOW_HEIGHT)
+        # Get screen position for powerups - keeping original normalized_x position
+        powerup_x = get_x_position_on_road(powerups.normalized_x[:n], y)
+        powerup_rects = self.get_rects(POWERUP, powerup_x, y)
+
+        # Check collision with player instances
+        candidates = self.cull_below(powerups.live_rows(), powerup_rects[1], self.get_formation_reach())
+        hit = self.find_formation_hit(powerup_rects, candidates)
+        while hit >= 0:
+            powerup_index = candidates[hit]
+            powerups.alive[powerup_index] = False
+            self.player_instances = max(1, self.player_instances + int(powerups.value[powerup_index]))
+            self.peak_player_instances = max(self.peak_player_instances, self.player_instances)
+            candidates = candidates[hit + 1:]
+            hit = self.find_formation_hit(powerup_rects, candidates)
+        powerups.compact()
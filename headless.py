@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import time
+from game_state import GameState
+from policies import POLICIES
+from profiler import FrameProfiler
+from settings import GAME_STATE_GAME_OVER
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the game simulation as fast as possible without a window")
+    parser.add_argument("--frames", type=int, default=3600, help="number of frames to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="seed for spawning and the input policy")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="input policy driving the player")
+    parser.add_argument("--render", action="store_true", help="also draw every frame to an off-screen surface")
+    parser.add_argument("--profile", action="store_true", help="time every phase of the frame and print a summary")
+    parser.add_argument("--trace", help="write per-frame phase timings and counters to this JSONL file")
+    args = parser.parse_args()
+
+    # Never open a real window, even when rendering
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    if args.render:
+        import main as renderer
+        renderer.init_display()
+
+    policy = POLICIES[args.policy]
+    input_rng = random.Random(args.seed)
+    state = GameState(args.seed)
+    profiler = None
+    if args.profile or args.trace:
+        profiler = FrameProfiler(args.trace)
+        state.profiler = profiler
+    games = 1
+    start = time.perf_counter()
+
+    for _ in range(args.frames):
+        if profiler is not None:
+            profiler.begin_frame()
+        state.step(policy(input_rng, state))
+        if state.game_state == GAME_STATE_GAME_OVER:
+            print(f"Game {games} over: score {state.score}")
+            state.reset(args.seed + games)  # Every following game gets the next seed
+            games += 1
+        elif args.render:
+            renderer.draw_game(state)
+            if profiler is not None:
+                profiler.mark('draw')
+        if profiler is not None:
+            profiler.end_frame()
+
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {args.frames} frames in {elapsed:.2f}s ({args.frames / elapsed:.0f} frames/s), "
+          f"{games} game(s), current score {state.score}, players {state.player_instances}")
+    projectiles = state.projectiles
+    print(f"Projectile pool: {projectiles.count}/{projectiles.capacity} live, {projectiles.dropped} dropped this game")
+    if profiler is not None:
+        print(profiler.summary())
+        profiler.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+
+class EntityView:
+    # Read-only stand-in for an EntityStore with the columns the renderer uses
+    def __init__(self, count, spawn_id, normalized_x, y, health, value, flash_timer):
+        self.count = count
+        self.spawn_id = spawn_id
+        self.normalized_x = normalized_x
+        self.y = y
+        self.health = health
+        self.value = value
+        self.flash_timer = flash_timer
+
+class StateView:
+    # What the renderer reads from a GameState
+    def __init__(self, state, player_x, stores):
+        self.player_x = player_x
+        self.player_y = state.player_y
+        self.player_instances = state.player_instances
+        self.formation_cap = state.formation_cap
+        self.score = state.score
+        self.flash_period = state.flash_period
+        self.game_state = state.game_state
+        self.projectiles, self.enemies, self.boss_enemies, self.powerups = stores
+
+def _stores(state):
+    return (state.projectiles, state.enemies, state.boss_enemies, state.powerups)
+
+def freeze(state):
+    # Copy of everything the renderer reads, which can be drawn while the state keeps changing on another thread
+    stores = []
+    for store in _stores(state):
+        n = store.count
+        stores.append(EntityView(n, store.spawn_id[:n].copy(), store.normalized_x[:n].copy(), store.y[:n].copy(),
+                                 store.health[:n].copy(), store.value[:n].copy(), store.flash_timer[:n].copy()))
+    return StateView(state, state.player_x, stores)
+
+class Interpolator:
+    # Keeps the positions from before the latest simulation step, so frames drawn between two
+    # steps can show everything part of the way from its previous to its current position.
+    # Entities are matched up by spawn_id, since rows move around when stores are compacted.
+
+    def __init__(self):
+        self.previous_player_x = None
+        self.previous = None
+
+    def capture(self, state):
+        # Call right before every step
+        self.previous_player_x = state.player_x
+        self.previous = []
+        for store in _stores(state):
+            n = store.count
+            order = np.argsort(store.spawn_id[:n])
+            self.previous.append((store.spawn_id[:n][order], store.normalized_x[:n][order], store.y[:n][order]))
+
+    def blend(self, state, alpha):
+        # View of the state (or a frozen copy of it) alpha (0-1) of the way from the previous step to the current one
+        if self.previous is None:
+            self.capture(state)
+        player_x = self.previous_player_x + (state.player_x - self.previous_player_x) * alpha
+        stores = []
+        for store, (spawn_ids, normalized_x, y) in zip(_stores(state), self.previous):
+            n = store.count
+            current_x = store.normalized_x[:n]
+            current_y = store.y[:n]
+            # Entities spawned by the latest step have no previous position and are drawn where they are
+            start_x, start_y = current_x, current_y
+            if len(spawn_ids):
+                found = np.minimum(np.searchsorted(spawn_ids, store.spawn_id[:n]), len(spawn_ids) - 1)
+                matched = spawn_ids[found] == store.spawn_id[:n]
+                start_x = np.where(matched, normalized_x[found], current_x)
+                start_y = np.where(matched, y[found], current_y)
+            stores.append(EntityView(n, store.spawn_id, start_x + (current_x - start_x) * alpha,
+                                     start_y + (current_y - start_y) * alpha,
+                                     store.health, store.value, store.flash_timer))
+        return StateView(state, player_x, stores)
@@ -0,0 +1,52 @@
+import numpy as np
+from settings import WINDOW_WIDTH, WINDOW_HEIGHT, ROAD_WIDTH_BOTTOM, ROAD_WIDTH_TOP, HORIZON_Y
+
+# Objects never shrink below / grow beyond these factors
+MIN_SCALE = 0.4  # Increased minimum scale from 0.2 to 0.4
+MAX_SCALE = 1.0
+
+# Road width and perspective scale are both linear in y. Their coefficients are worked out once
+# by rebuild() so every lookup is a single multiply-add instead of the full interpolation
+road_center_x = 0.0
+road_width_at_zero = 0.0
+road_width_per_y = 0.0
+scale_at_zero = 0.0
+scale_per_y = 0.0
+
+def rebuild(window_width=WINDOW_WIDTH, window_height=WINDOW_HEIGHT, horizon_y=HORIZON_Y,
+            road_width_bottom=ROAD_WIDTH_BOTTOM, road_width_top=ROAD_WIDTH_TOP):
+    # Recompute the coefficients, call again whenever the view geometry changes (e.g. window resize)
+    global road_center_x, road_width_at_zero, road_width_per_y, scale_at_zero, scale_per_y
+    depth = window_height - horizon_y
+    road_center_x = window_width / 2
+    # Road is road_width_top wide at the horizon and road_width_bottom at the bottom of the window
+    road_width_per_y = (road_width_bottom - road_width_top) / depth
+    road_width_at_zero = road_width_bottom - road_width_per_y * window_height
+    # Objects appear larger when closer (lower y value = further away)
+    scale_per_y = 1 / depth
+    scale_at_zero = -horizon_y / depth
+
+rebuild()
+
+def get_depth(y_pos):
+    # 0 at the horizon, 1 at the bottom of the window (not clamped), works on arrays as well
+    return scale_at_zero + scale_per_y * y_pos
+
+def get_scale_factor(y_pos):
+    # Single y position
+    return max(MIN_SCALE, min(MAX_SCALE, scale_at_zero + scale_per_y * y_pos))
+
+def get_scale_factors(y_positions):
+    # Batched get_scale_factor for an array of y positions
+    return np.clip(scale_at_zero + scale_per_y * y_positions, MIN_SCALE, MAX_SCALE)
+
+def get_road_width(y_pos):
+    # Works on single values as well as arrays
+    return road_width_at_zero + road_width_per_y * y_pos
+
+def get_x_position_on_road(normalized_x, y_pos, road_width=None):
+    # Convert a normalized x position (0-1) to actual x position based on perspective.
+    # Works on single values as well as arrays, pass road_width when it is already known
+    if road_width is None:
+        road_width = road_width_at_zero + road_width_per_y * y_pos
+    return road_center_x + road_width * (normalized_x - 0.5)
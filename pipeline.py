@@ -0,0 +1,130 @@
+import threading
+import time
+from game_state import INPUT_FIRE
+from interpolation import Interpolator, freeze
+from settings import SIMULATION_HZ, BASE_SIMULATION_HZ, MAX_STEPS_PER_FRAME, AUTOFIRE_RATE, GAME_STATE_PLAYING
+
+class Frame:
+    # One published simulation step: the state to draw, the positions to interpolate from and
+    # the time up to which the game has been simulated. Never changed after it is published.
+    def __init__(self, state, interpolator, simulated_until):
+        self.state = state
+        self.interpolator = interpolator
+        self.simulated_until = simulated_until
+
+    def view(self, now, step_time):
+        # Interpolated view to draw at perf_counter time now
+        alpha = min(max((now - self.simulated_until) / step_time, 0.0), 1.0)
+        return self.interpolator.blend(self.state, alpha)
+
+class Simulation:
+    # Advances a GameState in fixed steps of 1 / SIMULATION_HZ seconds of real time and publishes
+    # a Frame after every step for the renderer.
+    #
+    # Without a thread, call update() once per drawn frame and the live state is published.
+    # With threaded=True, start() runs the steps on a worker thread and every Frame holds a
+    # frozen copy of the state, so the main thread can draw one frame while the next one is
+    # simulated (NumPy and pygame release the GIL for their larger operations). The published
+    # frame and the one being built are the two halves of the double buffer.
+    #
+    # Hold lock while touching the state from the main thread (snapshots, restarts, recordings).
+
+    def __init__(self, state, recorder=None, threaded=False):
+        self.state = state
+        self.recorder = recorder
+        self.threaded = threaded
+        self.step_time = 1.0 / SIMULATION_HZ
+        self.lock = threading.Lock()
+        self.input_lock = threading.Lock()
+        self.movement = 0  # INPUT_LEFT / INPUT_RIGHT bits of the keys held down
+        self.fire = False  # A fire key press waits here until a step uses it
+        self.fire_held = False
+        # While fire is held, a volley every autofire_interval steps (0 for only on key presses).
+        # Counted in steps so the projectile load does not depend on the frame rate
+        self.autofire_interval = state.ticks(BASE_SIMULATION_HZ / AUTOFIRE_RATE) if AUTOFIRE_RATE else 0
+        self.autofire_countdown = 0
+        self.stopping = threading.Event()
+        self.thread = None
+        self.frame = None
+        self.restart()
+
+    def set_inputs(self, movement, fire=False, fire_held=False):
+        with self.input_lock:
+            self.movement = movement
+            self.fire = self.fire or fire
+            self.fire_held = fire_held
+
+    def take_inputs(self):
+        with self.input_lock:
+            fire = self.fire
+            if fire:
+                self.autofire_countdown = self.autofire_interval
+            elif self.fire_held and self.autofire_interval:
+                self.autofire_countdown -= 1
+                if self.autofire_countdown <= 0:
+                    fire = True
+                    self.autofire_countdown = self.autofire_interval
+            self.fire = False
+            return self.movement | (INPUT_FIRE if fire else 0)
+
+    def restart(self):
+        # Call after the state was reset or restored (holding lock): draw it as it is and simulate from now
+        with self.input_lock:
+            self.fire = False
+            self.autofire_countdown = 0
+        interpolator = Interpolator()
+        interpolator.capture(self.state)
+        self.publish(interpolator, time.perf_counter())
+
+    def publish(self, interpolator, simulated_until):
+        self.frame = Frame(freeze(self.state) if self.threaded else self.state, interpolator, simulated_until)
+
+    def advance(self):
+        # Run the steps that are due by now
+        if self.state.game_state != GAME_STATE_PLAYING:
+            return
+        now = time.perf_counter()
+        simulated_until = self.frame.simulated_until
+        steps = 0
+        while simulated_until + self.step_time <= now and steps < MAX_STEPS_PER_FRAME:
+            interpolator = Interpolator()
+            interpolator.capture(self.state)
+            inputs = self.take_inputs()
+            self.state.step(inputs)
+            if self.recorder is not None:
+                self.recorder.record(inputs, self.state)
+            simulated_until += self.step_time
+            steps += 1
+            if steps == MAX_STEPS_PER_FRAME:
+                # Too far behind to catch up: let the game slow down instead of spiralling
+                simulated_until = max(simulated_until, now - self.step_time)
+            self.publish(interpolator, simulated_until)
+            if self.state.game_state != GAME_STATE_PLAYING:
+                break
+
+    def update(self):
+        # Called once per drawn frame, simulates here unless the worker thread does
+        if not self.threaded:
+            self.advance()
+
+    def start(self):
+        if self.threaded:
+            self.thread = threading.Thread(target=self.run_thread, name="simulation", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    def run_thread(self):
+        while not self.stopping.is_set():
+            with self.lock:
+                self.advance()
+                if self.state.game_state == GAME_STATE_PLAYING:
+                    wait = self.frame.simulated_until + self.step_time - time.perf_counter()
+                else:
+                    wait = self.step_time  # Nothing advances while the game over menu is up
+            if wait > 0:
+                self.stopping.wait(wait)
@@ -0,0 +1,34 @@
+from game_state import INPUT_LEFT, INPUT_RIGHT, INPUT_FIRE
+
+# Input policies for driving a GameState without a player. Each one takes a
+# random.Random and the current state and returns the INPUT_* bits for the next frame.
+
+def random_inputs(rng, state):
+    # Wander left and right and fire now and then
+    inputs = 0
+    if rng.random() < 0.3:
+        inputs |= INPUT_LEFT
+    elif rng.random() < 0.3:
+        inputs |= INPUT_RIGHT
+    if rng.random() < 0.2:
+        inputs |= INPUT_FIRE
+    return inputs
+
+def sweep_inputs(rng, state):
+    # Sweep across the road and fire a volley every 10 frames
+    inputs = INPUT_FIRE if state.frames_survived % 10 == 0 else 0
+    if (state.frames_survived // 120) % 2 == 0:
+        inputs |= INPUT_LEFT
+    else:
+        inputs |= INPUT_RIGHT
+    return inputs
+
+def idle_inputs(rng, state):
+    # Stand still and never fire
+    return 0
+
+POLICIES = {
+    'random': random_inputs,
+    'sweep': sweep_inputs,
+    'idle': idle_inputs,
+}
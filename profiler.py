@@ -0,0 +1,74 @@
+import json
+import time
+
+class FrameProfiler:
+    # Opt-in per-frame instrumentation. Profiled code calls mark(phase) at the end of each phase,
+    # the time since the previous mark (or the start of the frame) is charged to that phase.
+    # Code that supports profiling keeps a profiler attribute that is None when it is disabled.
+
+    def __init__(self, trace_path=None, smoothing_frames=30):
+        self.frames = 0
+        self.phase_ms = {}  # Current frame
+        self.counters = {}  # Current frame
+        self.average_ms = {}  # Moving averages, for the overlay
+        self.average_frame_ms = 0.0
+        self.total_ms = {}  # Whole run, for summary()
+        self.total_frame_ms = 0.0
+        self.smoothing = 1 / smoothing_frames
+        self.trace_file = open(trace_path, 'w') if trace_path else None
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def begin_frame(self):
+        self.phase_ms = {}
+        self.counters = {}
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phase_ms[phase] = self.phase_ms.get(phase, 0.0) + (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def count(self, name, amount):
+        # Entity counts, collision tests etc. for the current frame
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end_frame(self):
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        smoothing = self.smoothing
+        self.average_frame_ms += (frame_ms - self.average_frame_ms) * smoothing
+        self.total_frame_ms += frame_ms
+        for phase, ms in self.phase_ms.items():
+            average = self.average_ms.get(phase, ms)
+            self.average_ms[phase] = average + (ms - average) * smoothing
+            self.total_ms[phase] = self.total_ms.get(phase, 0.0) + ms
+
+        if self.trace_file is not None:
+            self.trace_file.write(json.dumps({
+                'frame': self.frames,
+                'frame_ms': round(frame_ms, 4),
+                'phases': {phase: round(ms, 4) for phase, ms in self.phase_ms.items()},
+                'counters': self.counters,
+            }) + '\n')
+        self.frames += 1
+
+    def fps(self):
+        return 1000 / self.average_frame_ms if self.average_frame_ms > 0 else 0.0
+
+    def overlay_lines(self):
+        # Text for the on-screen overlay: FPS, then the smoothed time of each phase
+        lines = [f"{self.fps():.0f} FPS  {self.average_frame_ms:.2f} ms"]
+        lines.extend(f"{phase}: {ms:.2f} ms" for phase, ms in self.average_ms.items())
+        lines.extend(f"{name}: {value}" for name, value in self.counters.items())
+        return lines
+
+    def summary(self):
+        # Average milliseconds per frame for each phase over the whole run
+        frames = max(1, self.frames)
+        lines = [f"{self.frames} frames, {self.total_frame_ms / frames:.3f} ms/frame"]
+        lines.extend(f"  {phase:<12} {ms / frames:.3f} ms" for phase, ms in self.total_ms.items())
+        return "\n".join(lines)
+
+    def close(self):
+        if self.trace_file is not None:
+            self.trace_file.close()
+            self.trace_file = None
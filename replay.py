@@ -0,0 +1,130 @@
+import argparse
+import struct
+import time
+import zlib
+from game_state import GameState
+from profiler import FrameProfiler
+from settings import SIMULATION_HZ, SWEPT_COLLISIONS, FORMATION_INSTANCE_CAP
+
+# Replay file layout (little endian):
+#   header       magic, format version, seed, simulation rate, swept collisions flag,
+#                formation instance cap (0 for none), frame count, checkpoint interval, checkpoint count
+#   inputs       zlib compressed, one byte of INPUT_* bits per simulation step
+#   checkpoints  frame number and GameState.state_hash() after that frame
+MAGIC = b'YAGR'
+VERSION = 4  # 3: swept collisions flag, and volleys fired from the drawn layout with per-shot damage. 4: formation instance cap
+HEADER = struct.Struct('<4sBqH?IIII')
+CHECKPOINT = struct.Struct('<I16s')
+INPUTS_LENGTH = struct.Struct('<I')
+
+# Frames between two state hash checkpoints
+CHECKPOINT_INTERVAL = 300
+
+class InputRecorder:
+    # Records one game: call record() right after every GameState.step with the inputs it was given
+
+    def __init__(self, seed, checkpoint_interval=CHECKPOINT_INTERVAL, tick_rate=SIMULATION_HZ,
+                 swept_collisions=SWEPT_COLLISIONS, formation_cap=FORMATION_INSTANCE_CAP):
+        self.seed = seed
+        # The same inputs only give the same game at the same rate, with the same collision tests
+        # and with the formation split into the same instances
+        self.tick_rate = tick_rate
+        self.swept_collisions = swept_collisions
+        self.formation_cap = formation_cap
+        self.checkpoint_interval = checkpoint_interval
+        self.inputs = bytearray()
+        self.checkpoints = []
+
+    def record(self, inputs, state):
+        self.inputs.append(inputs)
+        if len(self.inputs) % self.checkpoint_interval == 0:
+            self.checkpoints.append((len(self.inputs), state.state_hash()))
+
+    def finish(self, state):
+        # Always check the final state, even between two checkpoints
+        if not self.checkpoints or self.checkpoints[-1][0] != len(self.inputs):
+            self.checkpoints.append((len(self.inputs), state.state_hash()))
+
+    def save(self, path):
+        inputs = zlib.compress(bytes(self.inputs), 9)
+        with open(path, 'wb') as replay_file:
+            replay_file.write(HEADER.pack(MAGIC, VERSION, self.seed, self.tick_rate, self.swept_collisions,
+                                          self.formation_cap or 0, len(self.inputs), self.checkpoint_interval,
+                                          len(self.checkpoints)))
+            replay_file.write(INPUTS_LENGTH.pack(len(inputs)))
+            replay_file.write(inputs)
+            for frame, state_hash in self.checkpoints:
+                replay_file.write(CHECKPOINT.pack(frame, state_hash))
+
+def load_recording(path):
+    # Returns an InputRecorder holding the recorded game
+    with open(path, 'rb') as replay_file:
+        data = replay_file.read()
+    if data[:4] != MAGIC or len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a replay file")
+    version = data[4]
+    if version != VERSION:
+        # Older games were simulated differently, their inputs no longer play out the same game
+        raise ValueError(f"{path} was recorded by an older version of the game (replay format {version}, "
+                         f"this one plays format {VERSION}) and can't be replayed")
+    (_, _, seed, tick_rate, swept_collisions, formation_cap, frames,
+     checkpoint_interval, checkpoint_count) = HEADER.unpack_from(data)
+    offset = HEADER.size
+    inputs_length, = INPUTS_LENGTH.unpack_from(data, offset)
+    offset += INPUTS_LENGTH.size
+
+    recording = InputRecorder(seed, checkpoint_interval, tick_rate, swept_collisions, formation_cap or None)
+    recording.inputs = bytearray(zlib.decompress(data[offset:offset + inputs_length]))
+    if len(recording.inputs) != frames:
+        raise ValueError(f"{path} is truncated: expected {frames} frames, found {len(recording.inputs)}")
+    offset += inputs_length
+    for _ in range(checkpoint_count):
+        recording.checkpoints.append(CHECKPOINT.unpack_from(data, offset))
+        offset += CHECKPOINT.size
+    return recording
+
+def replay(recording, profiler=None):
+    # Re-simulate the recorded game as fast as possible.
+    # Returns the final state and the frame numbers of the checkpoints whose state hash differs
+    state = GameState(recording.seed, recording.tick_rate, recording.swept_collisions, recording.formation_cap)
+    state.profiler = profiler
+    checkpoints = dict(recording.checkpoints)
+    mismatches = []
+    for frame, inputs in enumerate(recording.inputs, 1):
+        if profiler is not None:
+            profiler.begin_frame()
+        state.step(inputs)
+        if profiler is not None:
+            profiler.end_frame()
+        expected = checkpoints.get(frame)
+        if expected is not None and state.state_hash() != expected:
+            mismatches.append(frame)
+    return state, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-simulate a recorded game without a display and check it matches")
+    parser.add_argument("recording", help="replay file written while playing")
+    parser.add_argument("--profile", action="store_true", help="time every phase of the frame and print a summary")
+    parser.add_argument("--trace", help="write per-frame phase timings and counters to this JSONL file")
+    args = parser.parse_args()
+
+    recording = load_recording(args.recording)
+    profiler = FrameProfiler(args.trace) if args.profile or args.trace else None
+    start = time.perf_counter()
+    state, mismatches = replay(recording, profiler)
+    elapsed = time.perf_counter() - start
+
+    frames = len(recording.inputs)
+    print(f"Replayed {frames} frames in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.0f} frames/s), "
+          f"seed {recording.seed} at {recording.tick_rate} Hz{', swept' if recording.swept_collisions else ''}"
+          f"{f', formation capped at {recording.formation_cap}' if recording.formation_cap else ''}, final score {state.score}, players {state.player_instances}")
+    if profiler is not None:
+        print(profiler.summary())
+        profiler.close()
+    if mismatches:
+        print(f"State diverged at {len(mismatches)} of {len(recording.checkpoints)} checkpoints, first at frame {mismatches[0]}")
+        raise SystemExit(1)
+    print(f"All {len(recording.checkpoints)} checkpoints match")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Shared game constants, used by both the simulation and the renderer
+
+# Display settings
+WINDOW_WIDTH = 800
+WINDOW_HEIGHT = 600
+ROAD_WIDTH_BOTTOM = WINDOW_WIDTH // 2
+ROAD_WIDTH_TOP = ROAD_WIDTH_BOTTOM // 3
+HORIZON_Y = 100
+DIRTY_RECT_RENDERING = True  # False clears and flips the whole screen every frame
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GRAY = (128, 128, 128)
+DARK_GRAY = (64, 64, 64)
+YELLOW = (255, 255, 0)
+
+# Player settings
+PLAYER_WIDTH = 40
+PLAYER_HEIGHT = 40
+PLAYER_START_X = WINDOW_WIDTH // 2  # Center horizontally
+PLAYER_Y = WINDOW_HEIGHT - 80  # Move slightly higher up from the bottom
+player_speed = 5
+player_circle_radius = ROAD_WIDTH_BOTTOM // 6
+PLAYER_LOD_THRESHOLD = 100  # Bigger formations are drawn as one cached sprite of the whole formation
+FORMATION_INSTANCE_CAP = None  # When set, bigger formations draw, fire and collide as this many instances, sharing the players between them
+
+# Projectile settings
+PROJECTILE_BASE_WIDTH = 8
+PROJECTILE_BASE_HEIGHT = 15
+projectile_speed = 7
+PROJECTILE_POOL_SIZE = 65536  # Projectile arrays are allocated once at this size, volleys that do not fit are cut short
+
+# Collision settings
+COLLISION_BUFFER = 5  # Small buffer to make collisions more forgiving
+GRID_CELL_SIZE = 32  # About the largest (closest) projectile sweep, projectiles are stored once and queries look that far
+USE_PROJECTILE_GRID = True  # False falls back to testing every projectile
+SWEPT_COLLISIONS = True  # Test projectiles over the whole path they moved in a step, so fast ones can't skip past targets
+COLLISION_BLOCK_SIZE = 65536  # Max entity x player instance pairs tested at once
+DIRECT_FORMATION_SIZE = 32  # Formations up to this size skip the bounds tests
+FORMATION_TEST_CHUNK = 4096  # Instance tests done at once after the ring bounds, small so the first hit ends the search early
+
+# Enemy settings
+ENEMY_BASE_WIDTH = 40  # Increased from 30
+ENEMY_BASE_HEIGHT = 40  # Increased from 30
+enemy_speed = 1
+spawn_rate = 60
+boss_spawn_chance = 0.05  # 5% chance when spawning enemies
+
+# Powerup settings
+POWERUP_BASE_WIDTH = 50   # Increased from 25 to take up more space
+POWERUP_BASE_HEIGHT = 50  # Made square for better visibility
+powerup_speed = 2
+powerup_spawn_rate = 300  # Spawn much less frequently than enemies
+powerup_min_value = -5
+powerup_max_value = 5
+flash_speed = 10  # Speed of number flashing
+
+# Game settings
+FPS = 60  # Render rate cap, 0 draws as often as possible
+SIMULATION_HZ = 60  # Simulation steps per second, independent of the render rate
+BASE_SIMULATION_HZ = 60  # Step rate the speeds, spawn rates and flash speed above are given for
+MAX_STEPS_PER_FRAME = 5  # Beyond this many steps behind, the game slows down instead of catching up
+AUTOFIRE_RATE = 0  # Volleys per second while fire is held down, 0 fires once per key press
+PIPELINED_SIMULATION = False  # Simulate on a worker thread while the main thread draws the previous step
+
+# Profiling (F3 toggles the profiler and its overlay while playing)
+PROFILE_FRAMES = False  # Start with the profiler overlay shown
+PROFILE_TRACE_PATH = None  # e.g. "frames.jsonl" to also write one JSON line per frame
+
+# Replays: e.g. "replays" to save the seed and inputs of every game there, play them back with replay.py
+REPLAY_DIRECTORY = None
+
+# Game states
+GAME_STATE_PLAYING = 0
+GAME_STATE_GAME_OVER = 1
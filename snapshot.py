@@ -0,0 +1,62 @@
+import struct
+import zlib
+from array import array
+
+# Snapshot layout (little endian):
+#   header   magic, format version, compressed flag
+#   body     (zlib compressed when the flag is set)
+#            game scalars, tunables and formation instance cap (0 for none), RNG state, then every entity
+#            store as written by EntityStore.pack()
+MAGIC = b'YAGS'
+VERSION = 3  # 2: projectiles carry the damage they deal in their value column. 3: formation instance cap
+HEADER = struct.Struct('<4sBB')
+SCALARS = struct.Struct('<dd8qqdqqqq')
+RNG_WORDS = 625  # Mersenne Twister state plus its position
+RNG_GAUSS = struct.Struct('<?d')  # Whether a cached gauss value exists, and the value
+
+def _stores(state):
+    return (state.projectiles, state.enemies, state.boss_enemies, state.powerups)
+
+def save_snapshot(state, compress=False):
+    # Everything needed to continue the game exactly where it is, as bytes
+    _, words, gauss_next = state.rng.getstate()
+    parts = [
+        SCALARS.pack(state.player_x, state.player_y, state.player_instances, state.score, state.frame_count,
+                     state.frames_survived, state.peak_player_instances, state.boss_kills, state.game_state,
+                     state.seed, state.spawn_rate, state.boss_spawn_chance, state.powerup_spawn_rate,
+                     state.powerup_min_value, state.powerup_max_value, state.formation_cap or 0),
+        array('I', words).tobytes(),
+        RNG_GAUSS.pack(gauss_next is not None, gauss_next or 0.0),
+    ]
+    parts.extend(store.pack() for store in _stores(state))
+
+    body = b''.join(parts)
+    if compress:
+        body = zlib.compress(body, 1)
+    return HEADER.pack(MAGIC, VERSION, compress) + body
+
+def load_snapshot(state, data):
+    # Put a GameState back into the state saved by save_snapshot
+    magic, version, compressed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} snapshot")
+    body = memoryview(data)[HEADER.size:]
+    if compressed:
+        body = zlib.decompress(body)
+
+    (state.player_x, state.player_y, state.player_instances, state.score, state.frame_count,
+     state.frames_survived, state.peak_player_instances, state.boss_kills, state.game_state,
+     state.seed, state.spawn_rate, state.boss_spawn_chance, state.powerup_spawn_rate,
+     state.powerup_min_value, state.powerup_max_value, formation_cap) = SCALARS.unpack_from(body)
+    state.formation_cap = formation_cap or None
+    offset = SCALARS.size
+
+    words = array('I')
+    words.frombytes(body[offset:offset + RNG_WORDS * 4])
+    offset += RNG_WORDS * 4
+    has_gauss, gauss_next = RNG_GAUSS.unpack_from(body, offset)
+    offset += RNG_GAUSS.size
+    state.rng.setstate((3, tuple(words), gauss_next if has_gauss else None))
+
+    for store in _stores(state):
+        offset = store.unpack(body, offset)
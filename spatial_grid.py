@@ -0,0 +1,62 @@
+import numpy as np
+
+# Cell keys are cy * KEY_STRIDE + cx, unique as long as |cx| stays below half the stride
+KEY_STRIDE = 1 << 20
+
+def _cell_ranges(cell_size, buffer, left, top, width, height):
+    cx0 = np.floor(left / cell_size).astype(np.int64)
+    cx1 = np.floor((left + width + buffer) / cell_size).astype(np.int64)
+    cy0 = np.floor(top / cell_size).astype(np.int64)
+    cy1 = np.floor((top + height + buffer) / cell_size).astype(np.int64)
+    return cx0, cx1, cy0, cy1
+
+def expand_ranges(starts, counts):
+    # Concatenation of arange(start, start + count) for every (start, count) pair
+    total = int(counts.sum())
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(total)
+
+def _expand_cells(cx0, cx1, cy0, cy1):
+    # One (owner, cell key) row for every cell each rect touches
+    cells_x = cx1 - cx0 + 1
+    counts = cells_x * (cy1 - cy0 + 1)
+    owners = np.repeat(np.arange(len(counts)), counts)
+    local = expand_ranges(np.zeros(len(counts), dtype=np.int64), counts)
+    cx = cx0[owners] + local % cells_x[owners]
+    cy = cy0[owners] + local // cells_x[owners]
+    return owners, cy * KEY_STRIDE + cx
+
+class ProjectileGrid:
+    # Uniform screen-space grid used as a broad phase for projectile collisions.
+    # Every projectile is registered once, in the cell of its top left corner, and queries look
+    # as far up and left as the largest projectile (plus buffer) reaches, so any projectile that
+    # could pass check_collision against a query rect is guaranteed to be found.
+
+    def __init__(self, cell_size, buffer):
+        self.cell_size = cell_size
+        self.buffer = buffer
+        self.size = 0
+        self.reach_x = 0.0  # Largest projectile width and height
+        self.reach_y = 0.0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.items = np.zeros(0, dtype=np.int64)
+
+    def rebuild(self, left, top, width, height):
+        # Arrays describe the projectile rects in store order
+        self.size = len(left)
+        self.reach_x = float(width.max()) if len(width) else 0.0
+        self.reach_y = float(height.max()) if len(height) else 0.0
+        keys = (np.floor(top / self.cell_size).astype(np.int64) * KEY_STRIDE
+                + np.floor(left / self.cell_size).astype(np.int64))
+        self.items = np.argsort(keys, kind='stable')
+        self.keys = keys[self.items]
+
+    def query_pairs(self, left, top, width, height):
+        # Candidate (query index, projectile index) pairs, every pair at most once
+        reach_x = self.reach_x + self.buffer
+        reach_y = self.reach_y + self.buffer
+        queries, keys = _expand_cells(*_cell_ranges(self.cell_size, self.buffer, left - reach_x, top - reach_y,
+                                                    width + reach_x, height + reach_y))
+        starts = np.searchsorted(self.keys, keys, side='left')
+        counts = np.searchsorted(self.keys, keys, side='right') - starts
+        return np.repeat(queries, counts), self.items[expand_ranges(starts, counts)]
@@ -0,0 +1,113 @@
+import math
+import pygame
+from collections import OrderedDict
+from formation import get_formation_offsets
+from perspective import MIN_SCALE, MAX_SCALE
+from settings import WINDOW_WIDTH, WINDOW_HEIGHT, BLACK, RED, DARK_GRAY, YELLOW, PLAYER_WIDTH, PLAYER_HEIGHT
+
+# Perspective scales (get_scale_factor's MIN_SCALE-MAX_SCALE range) are snapped to this many steps,
+# each step gets its own pre-rendered sprite the first time it is needed
+SCALE_STEPS = 61
+
+# Never appears in the sprites, marks their transparent background
+COLORKEY = (255, 0, 255)
+
+POWERUP_ALPHA = 160
+
+# Large formations are drawn as one sprite of the whole formation. Instance counts are grouped
+# into buckets, this many per doubling, and every bucket is drawn with the layout of one representative count
+FORMATION_BUCKETS_PER_DOUBLING = 8
+MAX_CACHED_FORMATIONS = 16
+
+_player_sprites = {}
+_formation_sprites = OrderedDict()
+_powerup_sprites = {}
+_overlays = {}
+
+def quantize_scale(scale):
+    # Snap a perspective scale to the nearest step
+    step = (MAX_SCALE - MIN_SCALE) / (SCALE_STEPS - 1)
+    index = round((min(MAX_SCALE, max(MIN_SCALE, scale)) - MIN_SCALE) / step)
+    return MIN_SCALE + index * step
+
+def get_player_sprite(scale):
+    # Player body plus its shadow, positioned so the blit goes to (x - width//2, y - height//2)
+    scale = quantize_scale(scale)
+    sprite = _player_sprites.get(scale)
+    if sprite is None:
+        width = PLAYER_WIDTH * scale
+        height = PLAYER_HEIGHT * scale
+        sprite = pygame.Surface((int(width) + 1, int(height * 1.5) + 1))
+        sprite.fill(COLORKEY)
+        sprite.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        pygame.draw.rect(sprite, RED, (0, 0, width, height))
+
+        # Shadow below the body, relative to the same top left corner
+        shadow_top = height // 2 + height // 2
+        shadow_points = [
+            (0, shadow_top),
+            (width, shadow_top),
+            (width // 2 + width // 3, height // 2 + height),
+            (width // 2 - width // 3, height // 2 + height)
+        ]
+        pygame.draw.polygon(sprite, DARK_GRAY, shadow_points)
+        _player_sprites[scale] = sprite
+    return sprite
+
+def get_formation_bucket(instances):
+    # Representative instance count of the bucket that instances falls in, within about 5% of it
+    step = round(math.log2(instances) * FORMATION_BUCKETS_PER_DOUBLING)
+    return max(1, int(2 ** (step / FORMATION_BUCKETS_PER_DOUBLING)))
+
+def get_formation_sprite(instances, scale, circle_radius):
+    # Whole formation pre-rendered from the player sprite. Returns (sprite, offset_x, offset_y): blit it
+    # at the top left corner of an instance at the formation center, moved by the offsets
+    bucket = get_formation_bucket(instances)
+    scale = quantize_scale(scale)
+    key = (bucket, scale, circle_radius)
+    entry = _formation_sprites.get(key)
+    if entry is not None:
+        _formation_sprites.move_to_end(key)
+        return entry
+
+    player_sprite = get_player_sprite(scale)
+    offsets_x, offsets_y = get_formation_offsets(bucket, PLAYER_WIDTH * scale, circle_radius)
+    offset_x = math.floor(min(offsets_x))
+    offset_y = math.floor(min(offsets_y))
+    sprite = pygame.Surface((math.ceil(max(offsets_x)) - offset_x + player_sprite.get_width(),
+                             math.ceil(max(offsets_y)) - offset_y + player_sprite.get_height()))
+    sprite.fill(COLORKEY)
+    sprite.set_colorkey(COLORKEY, pygame.RLEACCEL)
+    sprite.blits([(player_sprite, (x - offset_x, y - offset_y)) for x, y in zip(offsets_x, offsets_y)], False)
+
+    entry = (sprite, offset_x, offset_y)
+    _formation_sprites[key] = entry
+    if len(_formation_sprites) > MAX_CACHED_FORMATIONS:
+        _formation_sprites.popitem(last=False)  # Evict the least recently used formation
+    return entry
+
+def get_powerup_sprite(size):
+    # Semi-transparent square, one per whole pixel size
+    size = int(size)
+    sprite = _powerup_sprites.get(size)
+    if sprite is None:
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        sprite.fill((YELLOW[0], YELLOW[1], YELLOW[2], POWERUP_ALPHA))
+        _powerup_sprites[size] = sprite
+    return sprite
+
+def get_overlay(alpha=128):
+    # Full screen darkening layer drawn over the frozen game
+    overlay = _overlays.get(alpha)
+    if overlay is None:
+        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        overlay.set_alpha(alpha)
+        overlay.fill(BLACK)
+        _overlays[alpha] = overlay
+    return overlay
+
+def clear_sprite_cache():
+    _player_sprites.clear()
+    _formation_sprites.clear()
+    _powerup_sprites.clear()
+    _overlays.clear()
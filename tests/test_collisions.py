@@ -0,0 +1,26 @@
+import pytest
+from game_state import GameState
+from settings import HORIZON_Y
+
+# A projectile a step's travel below an enemy ends the step above it. Only the swept test sees
+# the two pass each other
+
+def shoot_through(swept_collisions, enemy_y):
+    state = GameState(0, tick_rate=10, swept_collisions=swept_collisions)  # Six base frames per step
+    state.enemies.append(0.5, enemy_y)
+    state.spawn_projectiles(0.5, enemy_y + 20)
+    state.step()
+    return state
+
+@pytest.mark.parametrize('enemy_y', [HORIZON_Y + 5, 300])
+def test_swept_projectiles_hit_what_they_pass(enemy_y):
+    missed = shoot_through(False, enemy_y)
+    assert missed.score == 0 and missed.enemies.count == 1
+    hit = shoot_through(True, enemy_y)
+    assert hit.score == 10 and hit.enemies.count == 0 and hit.projectiles.count == 0
+
+def test_projectiles_past_the_horizon_are_retired():
+    state = GameState(0, swept_collisions=True)
+    state.spawn_projectiles(0.5, HORIZON_Y + 1)
+    state.step()
+    assert state.projectiles.count == 0
@@ -0,0 +1,24 @@
+import numpy as np
+from entities import EntityStore
+
+def test_full_pool_keeps_its_arrays():
+    # Overflowing volleys are dropped without reallocating the columns
+    store = EntityStore(capacity=64, max_capacity=100)
+    store.extend(np.zeros(100), np.arange(100.0))
+    columns = [getattr(store, name) for name in EntityStore.COLUMNS]
+    for _ in range(5):
+        store.extend(np.zeros(30), np.zeros(30))
+        store.append(0.5, 1.0)
+    assert all(getattr(store, name) is column for name, column in zip(EntityStore.COLUMNS, columns))
+    assert store.count == 100
+    assert store.dropped == 5 * 31
+    assert np.array_equal(store.y[:100], np.arange(100.0))
+
+def test_pool_grows_up_to_its_limit():
+    store = EntityStore(capacity=16, max_capacity=100)
+    store.extend(np.zeros(20), np.zeros(20))
+    assert store.capacity == 32 and store.dropped == 0
+    store.extend(np.zeros(90), np.zeros(90))
+    assert store.capacity == 100
+    assert store.count == 100
+    assert store.dropped == 10
@@ -0,0 +1,27 @@
+from formation import get_visible_instances, get_instance_weights
+from game_state import GameState, INPUT_FIRE
+
+def test_instances_add_up_to_the_players():
+    assert get_visible_instances(400, None) == (400, 1, 0)
+    assert get_visible_instances(400, 500) == (400, 1, 0)
+    assert get_visible_instances(501, 500) == (500, 1, 1)
+    assert get_visible_instances(1001, 500) == (500, 2, 1)
+    for players in (1, 499, 500, 501, 999, 1001, 20000, 123457):
+        weights = get_instance_weights(players, 500)
+        assert len(weights) == min(players, 500)
+        assert weights.sum() == players
+        assert weights.max() - weights.min() <= 1
+
+def test_projectiles_keep_the_damage_they_were_fired_with():
+    state = GameState(0, formation_cap=500)
+    state.player_instances = 20000
+    state.step(INPUT_FIRE)
+    projectiles = state.projectiles
+    assert projectiles.value[:projectiles.count].sum() == 20000
+
+    # The formation shrinking afterwards doesn't weaken the shots already on their way
+    state.player_instances = 3
+    state.boss_enemies.append(projectiles.normalized_x[0], projectiles.y[0] - 20, health=1000)
+    state.step()
+    assert state.boss_enemies.health[0] < 1000
+    assert (1000 - state.boss_enemies.health[0]) % 40 == 0
@@ -0,0 +1,51 @@
+import numpy as np
+from game_env import (
+    GameEnv, VectorGameEnv, ProcessVectorGameEnv, write_observation, write_observations,
+    OBSERVATION_SIZE, ACTIONS,
+)
+
+def random_actions(steps, envs):
+    return np.random.default_rng(0).integers(0, ACTIONS, (steps, envs))
+
+def test_batched_observations_match_single_ones():
+    env = VectorGameEnv(6, seed=10)
+    env.reset()
+    for actions in random_actions(200, 6):
+        env.step(actions)
+    batched = write_observations(np.zeros((6, OBSERVATION_SIZE), dtype=np.float32), env.states)
+    for state, row in zip(env.states, batched):
+        assert np.array_equal(write_observation(np.zeros(OBSERVATION_SIZE, dtype=np.float32), state), row)
+    assert batched[:, 2].all()  # Every game has an enemy in the first slot by now
+
+def test_vector_env_plays_the_single_games():
+    vector = VectorGameEnv(3, seed=5, max_steps=40)
+    singles = [GameEnv(seed=5 + i, max_steps=40) for i in range(3)]
+    observations, _ = vector.reset()
+    for i, single in enumerate(singles):
+        assert np.array_equal(single.reset()[0], observations[i])
+    for actions in random_actions(39, 3):
+        observations, rewards, terminated, truncated, _ = vector.step(actions)
+        for i, single in enumerate(singles):
+            observation, reward, single_terminated, _, _ = single.step(actions[i])
+            assert np.array_equal(observation, observations[i])
+            assert reward == rewards[i] and single_terminated == terminated[i]
+
+def test_process_env_matches_in_process_env():
+    # Same seeds, restarts included, whichever process steps the games
+    local = VectorGameEnv(5, seed=3, max_steps=25)
+    remote = ProcessVectorGameEnv(5, seed=3, max_steps=25, workers=2)
+    try:
+        expected_observations, _ = local.reset(seed=7)
+        actual_observations, _ = remote.reset(seed=7)
+        assert np.array_equal(expected_observations, actual_observations)
+        finished = 0
+        for actions in random_actions(60, 5):
+            expected = local.step(actions)
+            actual = remote.step(actions)
+            for expected_array, actual_array in zip(expected[:4], actual[:4]):
+                assert np.array_equal(expected_array, actual_array)
+            assert np.array_equal(expected[4]['final_score'], actual[4]['final_score'])
+            finished += int(expected[3].sum())
+        assert finished == 10
+    finally:
+        remote.close()
@@ -0,0 +1,82 @@
+import random
+import numpy as np
+import pytest
+import game_state
+from game_state import GameState, INPUT_FIRE
+from policies import POLICIES
+from settings import HORIZON_Y, WINDOW_HEIGHT, GAME_STATE_PLAYING
+
+# The grid broad phase only decides which pairs get tested, so every result has to be the same
+# as testing every projectile against every target
+
+def fill_road(state, rng, projectiles, enemies, bosses):
+    # Random projectiles, enemies and bosses all over the road, the same for the same rng seed
+    state.spawn_projectiles(rng.random(projectiles), rng.uniform(HORIZON_Y, WINDOW_HEIGHT, projectiles))
+    for _ in range(enemies):
+        state.enemies.append(rng.random(), rng.uniform(HORIZON_Y, WINDOW_HEIGHT))
+    for _ in range(bosses):
+        state.boss_enemies.append(rng.random(), rng.uniform(HORIZON_Y, WINDOW_HEIGHT),
+                                  health=int(rng.integers(1, 50)))
+
+def record_hits(state):
+    # List that every find_projectile_hits result of the state gets added to
+    found = []
+    find = state.find_projectile_hits
+
+    def recording(*args):
+        result = find(*args)
+        found.append(result)
+        return result
+
+    state.find_projectile_hits = recording
+    return found
+
+def run_steps(monkeypatch, use_grid, seed, steps):
+    monkeypatch.setattr(game_state, 'USE_PROJECTILE_GRID', use_grid)
+    state = GameState(seed)
+    state.player_instances = 40
+    fill_road(state, np.random.default_rng(seed), 2000, 60, 8)
+    hashes = []
+    for frame in range(steps):
+        state.step(INPUT_FIRE if frame % 4 == 0 else 0)
+        hashes.append(state.state_hash())
+    return state, hashes
+
+@pytest.mark.parametrize('seed', range(8))
+def test_random_rects_hit_the_same(monkeypatch, seed):
+    grid_state, grid_hashes = run_steps(monkeypatch, True, seed, 30)
+    all_state, all_hashes = run_steps(monkeypatch, False, seed, 30)
+    assert grid_state.score == all_state.score
+    assert grid_state.score > 0
+    assert grid_state.boss_kills == all_state.boss_kills
+    assert grid_hashes == all_hashes
+
+def test_single_step_hits_the_same(monkeypatch):
+    # Which projectile hit which target, for one step over a dense field
+    hits = []
+    for use_grid in (True, False):
+        monkeypatch.setattr(game_state, 'USE_PROJECTILE_GRID', use_grid)
+        state = GameState(0)
+        fill_road(state, np.random.default_rng(1), 5000, 200, 20)
+        hits.append(record_hits(state))
+        boss_health = state.boss_enemies.health[:state.boss_enemies.count].sum()
+        state.step()
+    assert hits[0] == hits[1]
+    assert any(hits[0])
+    assert state.boss_enemies.health[:state.boss_enemies.count].sum() < boss_health  # Every shot deals damage
+
+@pytest.mark.parametrize('policy', sorted(POLICIES))
+def test_seeded_games_match(monkeypatch, policy):
+    hashes = []
+    for use_grid in (True, False):
+        monkeypatch.setattr(game_state, 'USE_PROJECTILE_GRID', use_grid)
+        state = GameState(3)
+        rng = random.Random(3)
+        run = []
+        for frame in range(1500):
+            state.step(POLICIES[policy](rng, state))
+            run.append(state.state_hash())
+            if state.game_state != GAME_STATE_PLAYING:
+                break
+        hashes.append(run)
+    assert hashes[0] == hashes[1]
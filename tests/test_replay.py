@@ -0,0 +1,72 @@
+import random
+import struct
+import pytest
+import replay
+from game_state import GameState, INPUT_LEFT, INPUT_RIGHT, INPUT_FIRE, get_x_position_on_road
+from policies import POLICIES
+from replay import InputRecorder, load_recording
+
+def record_game(swept_collisions, frames=900):
+    state = GameState(11, swept_collisions=swept_collisions)
+    recorder = InputRecorder(state.seed, checkpoint_interval=100, swept_collisions=swept_collisions)
+    rng = random.Random(11)
+    for _ in range(frames):
+        inputs = POLICIES['sweep'](rng, state)
+        state.step(inputs)
+        recorder.record(inputs, state)
+    recorder.finish(state)
+    return recorder
+
+@pytest.mark.parametrize('swept_collisions', [True, False])
+def test_replays_play_back_with_their_collision_setting(tmp_path, swept_collisions):
+    path = tmp_path / 'game.rec'
+    record_game(swept_collisions).save(path)
+    recording = load_recording(path)
+    assert recording.swept_collisions == swept_collisions
+    state, mismatches = replay.replay(recording)
+    assert mismatches == []
+    assert state.swept_collisions == swept_collisions
+
+def collect_powerups(rng, state):
+    # Steer towards the best powerup on its way down, firing now and then
+    powerups = state.powerups
+    rows = powerups.live_rows()
+    inputs = INPUT_FIRE if state.frames_survived % 6 == 0 else 0
+    if len(rows):
+        best = rows[powerups.value[rows].argmax()]
+        x = get_x_position_on_road(powerups.normalized_x[best], powerups.y[best])
+        if x < state.player_x - 5:
+            inputs |= INPUT_LEFT
+        elif x > state.player_x + 5:
+            inputs |= INPUT_RIGHT
+    return inputs
+
+def test_replays_play_back_with_their_formation_cap(tmp_path):
+    path = tmp_path / 'game.rec'
+    state = GameState(1, formation_cap=2)
+    recorder = InputRecorder(state.seed, checkpoint_interval=100, formation_cap=2)
+    rng = random.Random(1)
+    for _ in range(900):
+        inputs = collect_powerups(rng, state)
+        state.step(inputs)
+        recorder.record(inputs, state)
+    recorder.finish(state)
+    assert state.peak_player_instances > 2
+    recorder.save(path)
+
+    recording = load_recording(path)
+    assert recording.formation_cap == 2
+    replayed, mismatches = replay.replay(recording)
+    assert mismatches == []
+    assert replayed.formation_cap == 2
+
+    # Without the cap the same inputs play out another game
+    recording.formation_cap = None
+    assert replay.replay(recording)[1] != []
+
+def test_older_replays_are_rejected(tmp_path):
+    path = tmp_path / 'old.rec'
+    # Version 3 header: no formation instance cap
+    path.write_bytes(struct.pack('<4sBqH?III', replay.MAGIC, 3, 11, 60, True, 0, 300, 0) + struct.pack('<I', 0))
+    with pytest.raises(ValueError, match="older version"):
+        load_recording(path)
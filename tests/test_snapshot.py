@@ -0,0 +1,22 @@
+import pytest
+import snapshot
+from game_state import GameState, INPUT_FIRE
+from snapshot import save_snapshot, load_snapshot
+
+def test_snapshots_continue_the_same_game():
+    state = GameState(4, formation_cap=3)
+    state.player_instances = 10
+    for _ in range(120):
+        state.step(INPUT_FIRE)
+    saved = save_snapshot(state, compress=True)
+    expected = [state.step(INPUT_FIRE) or state.state_hash() for _ in range(60)]
+
+    # Loaded into a game without a cap, the snapshot brings its own back
+    restored = GameState(0)
+    load_snapshot(restored, saved)
+    assert restored.formation_cap == 3
+    assert [restored.step(INPUT_FIRE) or restored.state_hash() for _ in range(60)] == expected
+
+def test_older_snapshots_are_rejected():
+    with pytest.raises(ValueError, match="snapshot"):
+        load_snapshot(GameState(0), snapshot.HEADER.pack(snapshot.MAGIC, 2, False))
@@ -0,0 +1,41 @@
+import pygame
+from collections import OrderedDict
+
+# Font sizes are rounded down to a multiple of this, so entities sliding down the road
+# reuse the same font and rendered text for several frames instead of one size per pixel
+FONT_SIZE_STEP = 2
+
+# How many rendered text surfaces to keep around
+MAX_CACHED_TEXTS = 256
+
+_font_pool = {}
+_text_cache = OrderedDict()
+
+def get_font(size):
+    # Font objects are expensive to create, keep one per size for the whole run
+    font = _font_pool.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()  # Only started once text is first drawn
+        font = pygame.font.Font(None, size)
+        _font_pool[size] = font
+    return font
+
+def render_text(text, size, color):
+    # Returns a rendered (antialiased) surface for text, rendering only on a cache miss
+    size -= size % FONT_SIZE_STEP
+    key = (size, text, color)
+    surface = _text_cache.get(key)
+    if surface is not None:
+        _text_cache.move_to_end(key)
+        return surface
+
+    surface = get_font(size).render(text, True, color)
+    _text_cache[key] = surface
+    if len(_text_cache) > MAX_CACHED_TEXTS:
+        _text_cache.popitem(last=False)  # Evict the least recently used surface
+    return surface
+
+def clear_text_cache():
+    _text_cache.clear()
+    _font_pool.clear()